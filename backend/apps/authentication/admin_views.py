@@ -22,7 +22,7 @@ class AdminViewSet(viewsets.ViewSet):
     def retrieve(self, request, pk=None):
         """Get specific user details"""
         try:
-            user = User.objects.get(id=pk)
+            user = User.objects.select_related('storage_usage').get(id=pk)
             serializer = AdminUserSerializer(user)
             return Response(serializer.data)
         except User.DoesNotExist:
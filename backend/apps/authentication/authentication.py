@@ -1,8 +1,30 @@
+import copy
+
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
 from django.conf import settings
 from rest_framework.authentication import CSRFCheck
 from rest_framework import exceptions
 
+from utils.cache import TTLCache
+
+_users = None
+
+
+def get_user_cache():
+    global _users
+    if _users is None:
+        _users = TTLCache(
+            maxsize=settings.AUTH_USER_CACHE_SIZE,
+            ttl=settings.AUTH_USER_CACHE_TTL
+        )
+    return _users
+
+
+def invalidate_user(user_id):
+    """Drop a cached user, e.g. after it was changed, deleted or logged out"""
+    get_user_cache().pop(str(user_id))
+
 class CustomJWTAuthentication(JWTAuthentication):
     def authenticate(self, request):
         header = self.get_header(request)
@@ -25,4 +47,27 @@ class CustomJWTAuthentication(JWTAuthentication):
         check.process_request(request)
         reason = check.process_view(request, None, (), {})
         if reason:
-            raise exceptions.PermissionDenied('CSRF Failed: %s' % reason) 
\ No newline at end of file
+            raise exceptions.PermissionDenied('CSRF Failed: %s' % reason) 
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves the token's user from an in-process
+    TTL cache instead of querying User on every request. The cache is per
+    process: invalidate_user() clears the local entry and other workers
+    pick up changes within AUTH_USER_CACHE_TTL seconds.
+    """
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        # The password-changed check needs the current row
+        if user_id is None or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        cache = get_user_cache()
+        user = cache.get(str(user_id))
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(str(user_id), user)
+        # Each request gets its own instance, so changes made while handling
+        # one request never leak into another through the cache
+        return copy.copy(user)
@@ -1,65 +1,163 @@
-from google.oauth2 import id_token
-from google.auth.transport import requests
+import logging
+import re
+import threading
+import time
+
+from google.auth import jwt
 import requests as http_requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
+from django.conf import settings
 from dotenv import load_dotenv
 
+from utils.log import log_event
+
 # Load environment variables
 load_dotenv()
 
-def verify_google_token(code, redirect_uri):
+logger = logging.getLogger(__name__)
+
+GOOGLE_ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+def cache_lifetime(headers):
+    """Seconds a response may be reused for, from Cache-Control and Age"""
+    cache_control = headers.get('Cache-Control', '')
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = MAX_AGE_RE.search(cache_control)
+    if not match:
+        return 0
     try:
-        client_id = os.getenv('GOOGLE_OAUTH2_CLIENT_ID')
-        client_secret = os.getenv('GOOGLE_OAUTH2_CLIENT_SECRET')
+        age = int(headers.get('Age', 0))
+    except ValueError:
+        age = 0
+    return max(0, int(match.group(1)) - age)
 
-        print("Token verification config:", {
-            'client_id_length': len(client_id) if client_id else None,
-            'redirect_uri': redirect_uri,
-            'code_length': len(code) if code else None
-        })
 
-        if not client_id or not client_secret:
-            raise ValueError("Google OAuth2 credentials not found in environment variables")
+class GoogleOAuthClient:
+    """
+    Exchanges authorization codes and verifies Google ID tokens.
+
+    One client is shared by all requests: its requests Session pools
+    connections to Google, failed connections are retried, and Google's
+    signing certificates are cached for as long as their Cache-Control
+    header allows, so a login only fetches them when they have expired
+    or a token is signed with a key that is not cached yet.
+    """
+
+    def __init__(self, client_id, client_secret, token_url=None, certs_url=None,
+                 timeout=None, retries=None):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.token_url = token_url or settings.GOOGLE_OAUTH2_TOKEN_URL
+        self.certs_url = certs_url or settings.GOOGLE_OAUTH2_CERTS_URL
+        self.timeout = timeout or settings.GOOGLE_OAUTH2_TIMEOUT
+        self.session = self.build_session(
+            settings.GOOGLE_OAUTH2_RETRIES if retries is None else retries
+        )
+        self._certs = None
+        self._certs_expire_at = 0
+        self._certs_lock = threading.Lock()
+
+    def build_session(self, retries):
+        # Connection errors are retried for every request; errors after the
+        # request was sent only for GETs, since an authorization code can
+        # only be exchanged once
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.2,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(max_retries=retry)
+        session = http_requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
 
-        token_endpoint = 'https://oauth2.googleapis.com/token'
-        data = {
+    def exchange_code(self, code, redirect_uri):
+        response = self.session.post(self.token_url, data={
             'code': code,
-            'client_id': client_id,
-            'client_secret': client_secret,
+            'client_id': self.client_id,
+            'client_secret': self.client_secret,
             'redirect_uri': redirect_uri,
             'grant_type': 'authorization_code',
             'access_type': 'offline'
-        }
+        }, timeout=self.timeout)
+        return response.json()
 
-        print("Making token exchange request...")
-        response = http_requests.post(token_endpoint, data=data)
-        print("Token exchange status:", response.status_code)
-        token_data = response.json()
-        print("Token exchange response:", token_data)
+    def get_certs(self, refresh=False):
+        """Google's signing certificates by key id, cached per Cache-Control"""
+        with self._certs_lock:
+            if not refresh and self._certs is not None and time.monotonic() < self._certs_expire_at:
+                return self._certs
+            try:
+                response = self.session.get(self.certs_url, timeout=self.timeout)
+                response.raise_for_status()
+            except http_requests.RequestException:
+                if self._certs is None:
+                    raise
+                return self._certs  # Google unreachable: keep using the stale certs
+            self._certs = response.json()
+            self._certs_expire_at = time.monotonic() + cache_lifetime(response.headers)
+            return self._certs
+
+    def verify_id_token(self, token):
+        key_id = jwt.decode_header(token).get('kid')
+        certs = self.get_certs()
+        if key_id not in certs:
+            # Google rotated its keys before our copy expired
+            certs = self.get_certs(refresh=True)
+        idinfo = jwt.decode(
+            token,
+            certs=certs,
+            audience=self.client_id,
+            clock_skew_in_seconds=60  # Allow some clock skew
+        )
+        if idinfo['iss'] not in GOOGLE_ISSUERS:
+            raise ValueError('Invalid issuer.')
+        return idinfo
+
+
+_client = None
+
+
+def get_google_client():
+    global _client
+    if _client is None:
+        client_id = os.getenv('GOOGLE_OAUTH2_CLIENT_ID')
+        client_secret = os.getenv('GOOGLE_OAUTH2_CLIENT_SECRET')
+        if not client_id or not client_secret:
+            raise ValueError("Google OAuth2 credentials not found in environment variables")
+        _client = GoogleOAuthClient(client_id, client_secret)
+    return _client
+
+
+def verify_google_token(code, redirect_uri):
+    try:
+        client = get_google_client()
+
+        log_event(logger, 'auth.google_token', 'exchanging authorization code',
+                  redirect_uri=redirect_uri, code_length=len(code) if code else None)
+        token_data = client.exchange_code(code, redirect_uri)
 
         if 'error' in token_data:
             error_msg = token_data.get('error_description', token_data['error'])
-            error_details = {
-                'error': error_msg,
-                'error_uri': token_data.get('error_uri'),
-                'error_description': token_data.get('error_description')
-            }
-            print("Token exchange error details:", error_details)
+            log_event(logger, 'auth.google_token', 'token exchange failed',
+                      level=logging.WARNING,
+                      error=token_data['error'],
+                      error_description=token_data.get('error_description'),
+                      error_uri=token_data.get('error_uri'))
             raise ValueError(f"Token exchange failed: {error_msg}")
 
-        print("Verifying ID token...")
         # Verify the ID token
-        idinfo = id_token.verify_oauth2_token(
-            token_data['id_token'],
-            requests.Request(),
-            client_id,
-            clock_skew_in_seconds=60  # Allow some clock skew
-        )
-        
-        if idinfo['iss'] not in ['accounts.google.com', 'https://accounts.google.com']:
-            raise ValueError('Invalid issuer.')
-            
-        print(f"Successfully verified token for email: {idinfo['email']}")
+        idinfo = client.verify_id_token(token_data['id_token'])
+
+        log_event(logger, 'auth.google_token', 'id token verified', sub=idinfo.get('sub'))
         return {
             'email': idinfo['email'],
             'email_verified': idinfo['email_verified'],
@@ -67,7 +165,8 @@ def verify_google_token(code, redirect_uri):
             'picture': idinfo.get('picture'),
             'sub': idinfo.get('sub')
         }
-        
+
     except Exception as e:
-        print(f"Error in verify_google_token: {str(e)}")
-        raise ValueError(f'Token verification failed: {str(e)}') 
\ No newline at end of file
+        log_event(logger, 'auth.google_token', 'token verification failed',
+                  level=logging.WARNING, error=str(e))
+        raise ValueError(f'Token verification failed: {str(e)}')
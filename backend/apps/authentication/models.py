@@ -57,3 +57,10 @@ class User(AbstractUser):
             models.Index(fields=['email']),
             models.Index(fields=['google_id']),
         ]
+
+
+class RevokedToken(models.Model):
+    """A refresh token that may no longer be used, until it expires anyway"""
+    jti = models.CharField(max_length=255, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
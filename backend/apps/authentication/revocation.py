@@ -0,0 +1,146 @@
+"""
+Refresh-token revocation.
+
+Revoked token ids (jti) are stored in RevokedToken until the token would
+have expired anyway. Each process keeps a Bloom filter of the revoked
+ids in front of that table: a token that is not in the filter was
+certainly not revoked, so the common case (a valid refresh) needs no
+query. Only filter hits, revoked tokens and rare false positives, are
+confirmed against the table.
+
+The filter picks up revocations made by other processes with a small
+delta query every AUTH_REVOCATION_SYNC_INTERVAL seconds, and is rebuilt
+from the unexpired rows every AUTH_REVOCATION_REBUILD_INTERVAL seconds
+so that expired ids stop occupying it.
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from apps.files.maintenance import delete_in_batches, get_deadline
+from utils.bloom import BloomFilter
+
+from .models import RevokedToken
+
+# Revocations are fetched again this far back on every delta sync, so rows
+# committed late or stamped by a node with a slow clock are not missed
+SYNC_OVERLAP = timedelta(seconds=30)
+
+
+class RevocationStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        self._synced_at = None
+        self._next_sync = 0
+        self._next_rebuild = 0
+
+    def _new_filter(self):
+        return BloomFilter(
+            capacity=settings.AUTH_REVOCATION_FILTER_CAPACITY,
+            error_rate=settings.AUTH_REVOCATION_FILTER_ERROR_RATE
+        )
+
+    def _rebuild(self, now):
+        bloom = self._new_filter()
+        synced_at = timezone.now()
+        jtis = (
+            RevokedToken.objects.filter(expires_at__gt=synced_at)
+            .values_list('jti', flat=True)
+            .iterator(chunk_size=10000)
+        )
+        for jti in jtis:
+            bloom.add(jti)
+        self._bloom, self._synced_at = bloom, synced_at
+        self._next_rebuild = now + settings.AUTH_REVOCATION_REBUILD_INTERVAL
+
+    def _sync(self):
+        synced_at = timezone.now()
+        jtis = RevokedToken.objects.filter(
+            revoked_at__gte=self._synced_at - SYNC_OVERLAP
+        ).values_list('jti', flat=True)
+        for jti in jtis:
+            self._bloom.add(jti)
+        self._synced_at = synced_at
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now < self._next_sync:
+            return
+        with self._lock:
+            if self._bloom is None or force or now >= self._next_rebuild:
+                self._rebuild(now)
+            elif now >= self._next_sync:
+                self._sync()
+            self._next_sync = now + settings.AUTH_REVOCATION_SYNC_INTERVAL
+
+    def claim(self, jti, expires_at):
+        """
+        Revoke ``jti`` and return True, or return False if it already was.
+        The INSERT is the check, so of several requests racing to use the
+        same token, on any node, exactly one gets True.
+        """
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+            claimed = True
+        except IntegrityError:
+            claimed = False
+        self.refresh()
+        with self._lock:
+            self._bloom.add(jti)
+        return claimed
+
+    def revoke(self, jti, expires_at):
+        self.claim(jti, expires_at)
+
+    def is_revoked(self, jti):
+        self.refresh()
+        if jti not in self._bloom:
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+
+_store = None
+
+
+def get_revocation_store():
+    global _store
+    if _store is None:
+        _store = RevocationStore()
+    return _store
+
+
+def token_expiry(token):
+    return datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+
+
+def revoke_token(token):
+    """Revoke a simplejwt token until its own expiry"""
+    get_revocation_store().revoke(token['jti'], token_expiry(token))
+
+
+def claim_token(token):
+    """Revoke a token for single use; False if it had already been revoked"""
+    return get_revocation_store().claim(token['jti'], token_expiry(token))
+
+
+def is_token_revoked(token):
+    return get_revocation_store().is_revoked(token['jti'])
+
+
+def prune_revoked_tokens(batch_size=None, time_budget=None):
+    """
+    Delete revocation records of refresh tokens that have since expired.
+    Runs as a batched maintenance sweep, see apps.files.maintenance.
+    """
+    return delete_in_batches(
+        RevokedToken.objects.filter(expires_at__lt=timezone.now()),
+        batch_size or settings.MAINTENANCE_BATCH_SIZE,
+        get_deadline(time_budget)
+    )
+
@@ -1,15 +1,39 @@
 from typing import List
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from apps.files.models import File
+from apps.files.models import File, StorageUsage
+from .authentication import invalidate_user
 
 User = get_user_model()
 
 class AdminUserSerializer(serializers.ModelSerializer):
+    storage_used = serializers.SerializerMethodField()
+    storage_quota = serializers.SerializerMethodField()
+    file_count = serializers.SerializerMethodField()
+
     class Meta:
         model = User
-        fields = ('id', 'email', 'is_active', 'role', 'date_joined', 'last_login')
-        read_only_fields = ('date_joined', 'last_login')
+        fields = ('id', 'email', 'is_active', 'role', 'date_joined', 'last_login',
+                  'storage_used', 'storage_quota', 'file_count')
+        read_only_fields = ('date_joined', 'last_login', 'storage_used',
+                            'storage_quota', 'file_count')
+
+    def _get_usage(self, obj):
+        # Loaded with select_related('storage_usage'); users who never
+        # uploaded have no row
+        try:
+            return obj.storage_usage
+        except StorageUsage.DoesNotExist:
+            return StorageUsage(user=obj)
+
+    def get_storage_used(self, obj):
+        return self._get_usage(obj).bytes_used
+
+    def get_storage_quota(self, obj):
+        return self._get_usage(obj).effective_quota
+
+    def get_file_count(self, obj):
+        return self._get_usage(obj).file_count
 
 class AdminFileSerializer(serializers.ModelSerializer):
     owner_email = serializers.EmailField(source='owner.email', read_only=True)
@@ -25,7 +49,7 @@ class AdminService:
     @staticmethod
     def get_all_users() -> List[User]:
         """Get all users in the system"""
-        return User.objects.all()
+        return User.objects.select_related('storage_usage')
 
     @staticmethod
     def update_user(user_id: str, data: dict) -> User:
@@ -34,13 +58,16 @@ class AdminService:
         for key, value in data.items():
             setattr(user, key, value)
         user.save()
+        invalidate_user(user.pk)
         return user
 
     @staticmethod
     def delete_user(user_id: str) -> None:
         """Delete a user"""
         user = User.objects.get(id=user_id)
+        user_pk = user.pk
         user.delete()
+        invalidate_user(user_pk)
 
     @staticmethod
     def get_user_files(user_id: str) -> List[File]:
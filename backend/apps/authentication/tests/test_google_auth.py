@@ -0,0 +1,105 @@
+import datetime
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.test import SimpleTestCase
+from google.auth import crypt, jwt
+
+from apps.authentication.google_auth import GoogleOAuthClient, cache_lifetime
+
+
+def make_signing_key(key_id):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'stub')])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name).issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(now).not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()
+    )
+    signer = crypt.RSASigner.from_string(key_pem, key_id)
+    return signer, cert.public_bytes(serialization.Encoding.PEM).decode()
+
+
+class StubGoogle(BaseHTTPRequestHandler):
+    certs = {}
+    id_token = None
+    cert_fetches = 0
+
+    def send_json(self, data, headers=()):
+        body = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        type(self).cert_fetches += 1
+        self.send_json(self.certs, [('Cache-Control', 'public, max-age=3600')])
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_json({'id_token': self.id_token})
+
+    def log_message(self, *args):
+        pass
+
+
+class GoogleOAuthClientTests(SimpleTestCase):
+    def setUp(self):
+        self.server = HTTPServer(('127.0.0.1', 0), StubGoogle)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        base = f'http://127.0.0.1:{self.server.server_port}'
+        self.client = GoogleOAuthClient(
+            'client-id', 'secret', token_url=f'{base}/token', certs_url=f'{base}/certs'
+        )
+        StubGoogle.cert_fetches = 0
+
+    def sign(self, signer):
+        now = int(time.time())
+        return jwt.encode(signer, {
+            'iss': 'https://accounts.google.com',
+            'aud': 'client-id',
+            'iat': now,
+            'exp': now + 300,
+            'email': 'user@example.com',
+        }).decode()
+
+    def test_certs_are_cached_until_keys_rotate(self):
+        signer, cert = make_signing_key('key-1')
+        StubGoogle.certs = {'key-1': cert}
+        StubGoogle.id_token = self.sign(signer)
+
+        for _ in range(2):
+            token_data = self.client.exchange_code('code', 'http://localhost/callback')
+            idinfo = self.client.verify_id_token(token_data['id_token'])
+            self.assertEqual(idinfo['email'], 'user@example.com')
+        self.assertEqual(StubGoogle.cert_fetches, 1)
+
+        signer, cert = make_signing_key('key-2')
+        StubGoogle.certs = {'key-2': cert}
+        self.client.verify_id_token(self.sign(signer))
+        self.assertEqual(StubGoogle.cert_fetches, 2)
+
+    def test_cache_lifetime(self):
+        self.assertEqual(cache_lifetime({'Cache-Control': 'public, max-age=100', 'Age': '40'}), 60)
+        self.assertEqual(cache_lifetime({'Cache-Control': 'no-store, max-age=100'}), 0)
+        self.assertEqual(cache_lifetime({}), 0)
@@ -0,0 +1,103 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.authentication.authentication import get_user_cache
+from apps.authentication.models import RevokedToken, User
+from apps.authentication.revocation import get_revocation_store, prune_revoked_tokens
+from apps.authentication.services import AdminService
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        get_user_cache().clear()
+        self.user = User.objects.create_user(email='user@example.com', password='pass')
+        self.client = APIClient()
+        access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/files/')
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in queries if 'FROM "authentication_user"' in q['sql']]
+
+    def test_user_is_resolved_from_cache(self):
+        self.assertEqual(len(self.user_queries()), 1)
+        self.assertEqual(self.user_queries(), [])
+
+    def test_admin_changes_invalidate_the_cache(self):
+        self.user_queries()
+        AdminService.update_user(self.user.pk, {'is_active': False})
+        self.assertEqual(self.client.get('/api/files/').status_code, 401)
+
+
+class RefreshTokenRevocationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='pass')
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        get_revocation_store().refresh(force=True)
+
+    def post_refresh(self):
+        return self.client.post('/api/auth/refresh/', {'refresh': str(self.refresh)}, format='json')
+
+    def test_refresh_of_valid_token_skips_the_database(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_refresh()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+        self.assertEqual(
+            [q for q in queries if 'authentication_revokedtoken' in q['sql']], []
+        )
+
+    def test_logout_revokes_the_refresh_token(self):
+        response = self.client.post('/api/auth/logout/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(RevokedToken.objects.filter(jti=self.refresh['jti']).exists())
+        self.assertEqual(self.post_refresh().status_code, 401)
+
+    def test_expired_revocations_are_pruned(self):
+        now = timezone.now()
+        RevokedToken.objects.bulk_create([
+            RevokedToken(jti=f'expired-{i}', expires_at=now - timedelta(minutes=1))
+            for i in range(3)
+        ])
+        RevokedToken.objects.create(jti='live', expires_at=now + timedelta(days=1))
+
+        result = prune_revoked_tokens(batch_size=2)
+        self.assertEqual(result.deleted, 3)
+        self.assertTrue(result.done)
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+    def test_revocations_from_other_processes_are_synced(self):
+        RevokedToken.objects.create(
+            jti=self.refresh['jti'],
+            expires_at=timezone.now() + timedelta(days=1)
+        )
+        get_revocation_store().refresh(force=True)
+        self.assertEqual(self.post_refresh().status_code, 401)
+
+    @mock.patch.object(api_settings, 'ROTATE_REFRESH_TOKENS', True)
+    def test_rotated_token_can_only_be_used_once(self):
+        response = self.post_refresh()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], str(self.refresh))
+        self.assertEqual(self.post_refresh().status_code, 401)
+
+    @mock.patch.object(api_settings, 'ROTATE_REFRESH_TOKENS', True)
+    def test_rotation_by_another_worker_is_detected_before_sync(self):
+        # Another worker rotated the token; this worker's filter has not synced yet
+        RevokedToken.objects.create(
+            jti=self.refresh['jti'],
+            expires_at=timezone.now() + timedelta(days=1)
+        )
+        self.assertEqual(self.post_refresh().status_code, 401)
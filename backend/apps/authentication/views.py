@@ -1,18 +1,26 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, permission_classes
 from rest_framework.response import Response
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from .models import User
 from .serializers import UserSerializer, RegisterSerializer
 from .google_auth import verify_google_token
+from .authentication import invalidate_user
+from .revocation import claim_token, is_token_revoked, revoke_token
+from utils.log import log_event
+import logging
+
+logger = logging.getLogger(__name__)
 
 class AuthViewSet(viewsets.GenericViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
     def get_permissions(self):
-        if self.action in ['register', 'login', 'google_callback']:
+        if self.action in ['register', 'login', 'refresh', 'google_callback']:
             permission_classes = [permissions.AllowAny]
         else:
             permission_classes = [permissions.IsAuthenticated]
@@ -53,28 +61,55 @@ class AuthViewSet(viewsets.GenericViewSet):
             'access': str(refresh.access_token),
         })
 
+    @action(detail=False, methods=['post'])
+    def refresh(self, request):
+        try:
+            refresh = RefreshToken(request.data["refresh"])
+        except (KeyError, TokenError):
+            return Response({"error": "Invalid token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+        single_use = api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION
+        if single_use:
+            # Claimed in the database rather than checked against the filter,
+            # which may lag other workers: a reused token is always rejected
+            revoked = not claim_token(refresh)
+        else:
+            # Almost always answered by the in-memory filter, without a query
+            revoked = is_token_revoked(refresh)
+        if revoked:
+            return Response({"error": "Token has been revoked"},
+                          status=status.HTTP_401_UNAUTHORIZED)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        return Response(data)
+
     @action(detail=False, methods=['post'])
     def logout(self, request):
         try:
-            refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
-            token.blacklist()
-            return Response({"message": "Successfully logged out."})
-        except Exception:
+            token = RefreshToken(request.data["refresh"])
+        except (KeyError, TokenError):
+            return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
+        if str(token.get(api_settings.USER_ID_CLAIM)) != str(request.user.pk):
             return Response({"error": "Invalid token"}, status=status.HTTP_400_BAD_REQUEST)
 
+        revoke_token(token)
+        invalidate_user(request.user.pk)
+        return Response({"message": "Successfully logged out."})
+
     @action(detail=False, methods=['post'], url_path='google/callback')
     def google_callback(self, request):
         try:
             code = request.data.get('code')
             redirect_uri = request.data.get('redirect_uri')
             
-            print("Google callback received:", {
-                'code_length': len(code) if code else None,
-                'redirect_uri': redirect_uri,
-                'request_headers': dict(request.headers),
-                'request_data': request.data
-            })
+            log_event(logger, 'auth.google_callback', 'google callback received',
+                      code_length=len(code) if code else None,
+                      redirect_uri=redirect_uri)
             
             if not code or not redirect_uri:
                 return Response(
@@ -84,11 +119,11 @@ class AuthViewSet(viewsets.GenericViewSet):
 
             try:
                 user_info = verify_google_token(code, redirect_uri)
-                print("User info received:", user_info)
                 
                 user = User.objects.filter(email=user_info['email']).first()
+                created = user is None
                 
-                if not user:
+                if created:
                     user = User.objects.create_user(
                         email=user_info['email'],
                         password=None,
@@ -96,9 +131,8 @@ class AuthViewSet(viewsets.GenericViewSet):
                         google_id=user_info.get('sub'),
                         picture=user_info.get('picture')
                     )
-                    print(f"Created new user: {user.email}")
-                else:
-                    print(f"Found existing user: {user.email}")
+                log_event(logger, 'auth.google_callback', 'google login',
+                          user_id=user.pk, created=created)
                 
                 refresh = RefreshToken.for_user(user)
                 response_data = {
@@ -106,18 +140,19 @@ class AuthViewSet(viewsets.GenericViewSet):
                     'refresh': str(refresh),
                     'access': str(refresh.access_token),
                 }
-                print("Sending response:", response_data)
-                
+
                 return Response(response_data)
                 
             except ValueError as e:
-                print(f"Value Error in Google callback: {str(e)}")
+                log_event(logger, 'auth.google_callback', 'google login rejected',
+                          level=logging.WARNING, error=str(e))
                 return Response(
                     {'error': str(e)},
                     status=status.HTTP_400_BAD_REQUEST
                 )
         except Exception as e:
-            print(f"Unexpected error in Google callback: {str(e)}")
+            log_event(logger, 'auth.google_callback', 'google callback failed',
+                      level=logging.ERROR, exc_info=True)
             return Response(
                 {'error': 'Authentication failed', 'detail': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
@@ -0,0 +1,154 @@
+"""
+Access decisions for "can user U view/download file F".
+
+A decision is the user's role on the file: OWNER, one of the
+FileShare.Permissions values, or None for no access. Decisions are
+memoised on the request. If FILE_ACCESS_CACHE names a cache they are
+also cached across requests for FILE_ACCESS_CACHE_TTL seconds, or until
+the share granting access expires if that is sooner. That cache must be
+shared by every worker (see checks.py): a revoked share is invalidated
+once, by the worker that revoked it. Signal handlers in signals.py
+invalidate an entry when the transaction that created, changed or
+deleted the FileShare or File behind it commits; code that bypasses
+signals (bulk updates) must call invalidate() itself.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import models, transaction
+from django.utils import timezone
+
+from .models import File, FileShare
+
+OWNER = 'OWNER'
+NO_ACCESS = ''  # cached marker, distinguishes "no access" from a cache miss
+VIEWABLE = (OWNER, FileShare.Permissions.VIEW, FileShare.Permissions.DOWNLOAD)
+DOWNLOADABLE = VIEWABLE  # VIEW shares need the bytes too, for previews
+
+
+def get_cache():
+    """The cross-request decision cache, or None if it is disabled"""
+    if not settings.FILE_ACCESS_CACHE:
+        return None
+    return caches[settings.FILE_ACCESS_CACHE]
+
+
+def cache_key(file_id, user_id):
+    return f'files:access:{file_id}:{user_id}'
+
+
+def access_query(user, file_id):
+    """
+    One query returning the file's owner and the user's unexpired share
+    permission and its expiry
+    """
+    user_share = FileShare.objects.active().filter(file=models.OuterRef('pk'), shared_with=user)
+    return (
+        File.objects.filter(pk=file_id)
+        .annotate(
+            share_permission=models.Subquery(user_share.values('permission')[:1]),
+            share_expires_at=models.Subquery(user_share.values('expires_at')[:1]),
+        )
+        .values('owner_id', 'share_permission', 'share_expires_at')
+    )
+
+
+def role_from_row(user, row):
+    if row is None:
+        return None
+    if row['owner_id'] == user.id:
+        return OWNER
+    return row['share_permission']
+
+
+def timeout_from_row(user, row):
+    """Seconds to cache the decision: never past the share's expiry"""
+    timeout = settings.FILE_ACCESS_CACHE_TTL
+    if row is None or row['owner_id'] == user.id or row['share_expires_at'] is None:
+        return timeout
+    remaining = (row['share_expires_at'] - timezone.now()).total_seconds()
+    return max(0, min(timeout, int(remaining)))
+
+
+def load_access(user, file_id):
+    """Return (role, cache timeout) straight from the database"""
+    row = access_query(user, file_id).first()
+    return role_from_row(user, row), timeout_from_row(user, row)
+
+
+async def aload_access(user, file_id):
+    row = await access_query(user, file_id).afirst()
+    return role_from_row(user, row), timeout_from_row(user, row)
+
+
+def get_access(user, file_id, request=None):
+    """Return the user's role on the file, or None if they have no access"""
+    if not user or not user.is_authenticated:
+        return None
+    try:
+        file_id = uuid.UUID(str(file_id))
+    except ValueError:
+        return None
+
+    memo = getattr(request, '_file_access', None) if request is not None else None
+    if memo is not None and file_id in memo:
+        return memo[file_id]
+
+    cache = get_cache()
+    if cache is None:
+        access, _ = load_access(user, file_id)
+    else:
+        key = cache_key(file_id, user.id)
+        access = cache.get(key)
+        if access is None:
+            access, timeout = load_access(user, file_id)
+            access = access or NO_ACCESS
+            cache.set(key, access, timeout)
+
+    access = access or None
+    if request is not None:
+        if memo is None:
+            memo = request._file_access = {}
+        memo[file_id] = access
+    return access
+
+
+async def aget_access(user, file_id):
+    """get_access for async views, using the async ORM and cache APIs"""
+    if not user or not user.is_authenticated:
+        return None
+    try:
+        file_id = uuid.UUID(str(file_id))
+    except ValueError:
+        return None
+
+    cache = get_cache()
+    if cache is None:
+        access, _ = await aload_access(user, file_id)
+        return access
+
+    key = cache_key(file_id, user.id)
+    access = await cache.aget(key)
+    if access is None:
+        access, timeout = await aload_access(user, file_id)
+        access = access or NO_ACCESS
+        await cache.aset(key, access, timeout)
+    return access or None
+
+
+def invalidate(file_id, user_id):
+    invalidate_many([(file_id, user_id)])
+
+
+def invalidate_many(pairs):
+    """
+    Drop the cached decisions for (file_id, user_id) pairs once the current
+    transaction commits; dropping them earlier would let a concurrent
+    request cache the row as it was before the change
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    keys = [cache_key(file_id, user_id) for file_id, user_id in pairs]
+    transaction.on_commit(lambda: cache.delete_many(keys))
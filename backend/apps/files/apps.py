@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class FilesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.files' 
\ No newline at end of file
+    name = 'apps.files'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
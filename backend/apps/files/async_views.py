@@ -0,0 +1,147 @@
+"""
+Async download endpoints.
+
+These mirror FileViewSet.download, access_secure_link and
+access_signed_link as native Django async views. Under an ASGI server
+(core.asgi) a slow client only holds a coroutine, not a worker thread:
+JWT validation is CPU-only, permission lookups use the async ORM and
+cache APIs, and file reads are pushed to a thread pool one chunk at a
+time.
+"""
+import copy
+import functools
+
+from django.contrib.auth import get_user_model
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from apps.authentication.authentication import get_user_cache
+
+from . import access, signed_links
+from .delivery import get_delivery_backend, set_attachment_headers, set_inline_headers
+from .models import ConsumedLink, File, FileShare, SecureLink
+
+User = get_user_model()
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def require_safe(view):
+    """
+    Async counterpart of django.views.decorators.http.require_safe, which
+    only wraps coroutine views natively from Django 5.0
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return HttpResponseNotAllowed(SAFE_METHODS)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def authenticate(request):
+    """Resolve the bearer token's user without blocking the event loop"""
+    authenticator = JWTAuthentication()
+    header = authenticator.get_header(request)
+    if header is None:
+        return None
+    raw_token = authenticator.get_raw_token(header)
+    if raw_token is None:
+        return None
+    try:
+        validated_token = authenticator.get_validated_token(raw_token)
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, KeyError):
+        return None
+
+    cache = get_user_cache()
+    user = cache.get(str(user_id))
+    if user is None:
+        user = await User.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id},
+            is_active=True
+        ).afirst()
+        if user is None:
+            return None
+        cache.set(str(user_id), user)
+    return copy.copy(user)
+
+
+@require_safe
+async def download(request, pk):
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse(
+            {'detail': 'Authentication credentials were not provided.'},
+            status=401
+        )
+
+    role = await access.aget_access(user, pk)
+    if role is None:
+        raise Http404
+    if role not in access.DOWNLOADABLE:
+        return JsonResponse({'error': 'Access not permitted'}, status=403)
+
+    file_obj = await File.objects.filter(pk=pk).afirst()
+    if file_obj is None:
+        raise Http404
+
+    response = await get_delivery_backend().aserve(
+        request,
+        file_obj,
+        content_type='application/octet-stream'
+    )
+    return set_attachment_headers(response, file_obj)
+
+
+@require_safe
+async def access_secure_link(request, link_id):
+    # HEAD only checks the link; GET uses it up and ignores Range, see
+    # FileViewSet.access_secure_link
+    secure_link, consumed = await SecureLink.aconsume(link_id, peek=request.method == 'HEAD')
+    if secure_link is None:
+        raise Http404
+
+    if not consumed:
+        if secure_link.is_expired:
+            return JsonResponse({'error': 'Link has expired'}, status=410)
+        return JsonResponse({'error': 'Link has already been used'}, status=410)
+
+    response = await get_delivery_backend().aserve(
+        request,
+        secure_link.file,
+        content_type=secure_link.file.file_type,
+        partial=False
+    )
+    return set_inline_headers(response, secure_link.file)
+
+
+@require_safe
+async def access_signed_link(request, token):
+    try:
+        link = signed_links.load_token(token)
+    except signed_links.ExpiredSignedLink:
+        return JsonResponse({'error': 'Link has expired'}, status=410)
+    except signed_links.InvalidSignedLink:
+        raise Http404
+
+    if link.single_use and not await ConsumedLink.aconsume(
+        link.nonce, link.expires_at, peek=request.method == 'HEAD'
+    ):
+        return JsonResponse({'error': 'Link has already been used'}, status=410)
+
+    file_obj = await File.objects.filter(pk=link.file_id).afirst()
+    if file_obj is None:
+        raise Http404
+
+    response = await get_delivery_backend().aserve(
+        request,
+        file_obj,
+        content_type=file_obj.file_type,
+        partial=not link.single_use
+    )
+    if link.permission == FileShare.Permissions.DOWNLOAD:
+        return set_attachment_headers(response, file_obj)
+    return set_inline_headers(response, file_obj)
@@ -0,0 +1,71 @@
+"""
+Content-addressed blob storage.
+
+When FILE_STORAGE_DEDUP is enabled, uploaded bytes are stored once per
+SHA-256 in a Blob row and every File holding the same ciphertext points
+at it. Blob.ref_count tracks how many File rows reference a blob;
+deleting a File only drops its reference, and the bytes are removed
+when the last reference goes away.
+"""
+import hashlib
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Blob
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def hash_upload(uploaded_file):
+    """Streaming SHA-256 of an UploadedFile, read chunk by chunk"""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+def acquire_blob(sha256, size, content):
+    """
+    Take a reference on the blob for ``sha256``. The bytes in ``content``
+    are only written if no blob with that digest exists yet.
+    Must be called inside a transaction together with the File save.
+    """
+    if Blob.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + 1):
+        return Blob.objects.get(sha256=sha256)
+
+    blob = Blob(sha256=sha256, size=size, ref_count=1)
+    blob.file.save(sha256, content, save=False)
+    try:
+        with transaction.atomic():
+            blob.save(force_insert=True)
+    except IntegrityError:
+        # Another upload of the same bytes won the race; use its blob
+        blob.file.delete(save=False)
+        Blob.objects.filter(sha256=sha256).update(ref_count=F('ref_count') + 1)
+        return Blob.objects.get(sha256=sha256)
+    return blob
+
+
+def attach_blob(file_instance, content):
+    """Point a not-yet-saved File at the deduplicated blob for its content"""
+    blob = acquire_blob(file_instance.content_hash, file_instance.size, content)
+    file_instance.blob = blob
+    file_instance.file = blob.file.name
+    return blob
+
+
+def release_blob(blob_id):
+    """
+    Drop one reference. When it was the last one, the Blob row is removed
+    and its bytes are deleted once the transaction commits.
+    """
+    with transaction.atomic():
+        Blob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1)
+        orphan = Blob.objects.filter(pk=blob_id, ref_count__lte=0).first()
+        if orphan is None:
+            return
+        storage, name = orphan.file.storage, orphan.file.name
+        orphan.delete()
+        transaction.on_commit(lambda: storage.delete(name))
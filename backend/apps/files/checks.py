@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register(Tags.caches)
+def check_access_cache(app_configs, **kwargs):
+    """FILE_ACCESS_CACHE must be visible to every worker"""
+    alias = settings.FILE_ACCESS_CACHE
+    if not alias:
+        return []
+    if alias not in settings.CACHES:
+        return [Error(
+            f"FILE_ACCESS_CACHE refers to the unknown cache '{alias}'.",
+            id='files.E001',
+        )]
+    if settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"FILE_ACCESS_CACHE '{alias}' is local to each process, so revoked "
+            "shares would keep granting access in other workers.",
+            hint='Use a shared cache backend such as Redis or Memcached, '
+                 'or set FILE_ACCESS_CACHE to None.',
+            id='files.E002',
+        )]
+    return []
@@ -0,0 +1,123 @@
+"""
+Pluggable file delivery.
+
+Views decide *whether* a file may be served; a delivery backend decides
+*how* the bytes reach the client. The backend is chosen with the
+FILE_DELIVERY_BACKEND setting:
+
+- StreamingDelivery streams the blob from the Django worker (development).
+- XAccelRedirectDelivery hands the transfer to nginx. It needs an internal
+  location mapping FILE_DELIVERY_INTERNAL_URL onto MEDIA_ROOT, e.g.
+
+      location /protected/ {
+          internal;
+          alias /app/assets/;
+      }
+
+- XSendfileDelivery hands the transfer to Apache mod_xsendfile, lighttpd
+  or any proxy that understands X-Sendfile with an absolute path.
+
+With the proxy backends the worker returns as soon as the headers are
+built; the proxy takes care of Range, ETag and the byte copy.
+
+``partial=False`` asks for the whole file whatever the request's Range and
+If-None-Match headers say. Single-use links need that: they are used up by
+the first request, so that request must receive the complete body rather
+than a 206 or 304. Such responses are always streamed by Django, since the
+proxy would apply the Range header itself.
+"""
+from urllib.parse import quote
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+from .encryption import get_data_key
+from .ranges import afile_response, file_response
+
+
+class BaseDelivery:
+    def serve(self, request, file_obj, content_type, partial=True):
+        raise NotImplementedError
+
+    async def aserve(self, request, file_obj, content_type, partial=True):
+        # Proxy backends only build headers, so the sync path never blocks
+        return self.serve(request, file_obj, content_type, partial)
+
+
+class StreamingDelivery(BaseDelivery):
+    def get_etag(self, file_obj):
+        return f'"{file_obj.content_hash}"' if file_obj.content_hash else None
+
+    def get_key(self, file_obj):
+        return get_data_key(file_obj) if file_obj.is_encrypted_at_rest else None
+
+    def serve(self, request, file_obj, content_type, partial=True):
+        fh = file_obj.file.open('rb')
+        return file_response(
+            request, fh, content_type,
+            etag=self.get_etag(file_obj),
+            key=self.get_key(file_obj),
+            partial=partial
+        )
+
+    async def aserve(self, request, file_obj, content_type, partial=True):
+        key = await sync_to_async(self.get_key, thread_sensitive=False)(file_obj)
+        fh = await sync_to_async(file_obj.file.open, thread_sensitive=False)('rb')
+        return await afile_response(
+            request, fh, content_type,
+            etag=self.get_etag(file_obj),
+            key=key,
+            partial=partial
+        )
+
+
+class XAccelRedirectDelivery(BaseDelivery):
+    header = 'X-Accel-Redirect'
+
+    def get_location(self, file_obj):
+        prefix = settings.FILE_DELIVERY_INTERNAL_URL.rstrip('/')
+        return f'{prefix}/{quote(file_obj.file.name)}'
+
+    def serve(self, request, file_obj, content_type, partial=True):
+        if file_obj.is_encrypted_at_rest or not partial:
+            # The proxy cannot decrypt, and would honour Range; Django has
+            # to stream the body
+            return StreamingDelivery().serve(request, file_obj, content_type, partial)
+        response = HttpResponse(content_type=content_type)
+        response[self.header] = self.get_location(file_obj)
+        return response
+
+    async def aserve(self, request, file_obj, content_type, partial=True):
+        if file_obj.is_encrypted_at_rest or not partial:
+            return await StreamingDelivery().aserve(request, file_obj, content_type, partial)
+        return self.serve(request, file_obj, content_type)
+
+
+class XSendfileDelivery(XAccelRedirectDelivery):
+    header = 'X-Sendfile'
+
+    def get_location(self, file_obj):
+        return file_obj.file.path
+
+
+def get_delivery_backend():
+    return import_string(settings.FILE_DELIVERY_BACKEND)()
+
+
+def set_attachment_headers(response, file_obj):
+    response['Content-Disposition'] = f'attachment; filename="{file_obj.original_name}"'
+    return response
+
+
+def set_inline_headers(response, file_obj):
+    response['X-File-Name'] = file_obj.original_name
+    response['X-File-Type'] = file_obj.file_type
+    response['Content-Disposition'] = f'inline; filename="{file_obj.original_name}"'
+    response['Access-Control-Expose-Headers'] = (
+        'X-File-Name, X-File-Type, Content-Type, Content-Disposition, '
+        'Content-Range, Accept-Ranges, ETag'
+    )
+    return response
+
@@ -0,0 +1,72 @@
+"""
+Server-side envelope encryption at rest.
+
+When FILE_ENCRYPTION_AT_REST is enabled, uploads are encrypted with the
+streaming format from utils.encryption under a fresh per-file data key.
+The key is wrapped by the configured key store and saved on the File.
+Unwrapped data keys are kept in a bounded in-process LRU with a TTL, so
+repeated downloads of hot files skip the unwrap.
+"""
+import os
+import uuid
+
+from django.conf import settings
+
+from utils.cache import TTLCache
+from utils.encryption import encrypt_fileobj, generate_stream_key
+
+from .keystore import get_keystore
+from .uploads import StagedFile
+
+_data_keys = None
+
+
+def get_data_key_cache():
+    global _data_keys
+    if _data_keys is None:
+        _data_keys = TTLCache(
+            maxsize=settings.FILE_DATA_KEY_CACHE_SIZE,
+            ttl=settings.FILE_DATA_KEY_CACHE_TTL
+        )
+    return _data_keys
+
+
+def data_key_cache_key(key_id, wrapped_key):
+    return key_id, bytes(wrapped_key)
+
+
+def get_data_key(file_obj):
+    """The unwrapped data key for an encrypted File"""
+    cache = get_data_key_cache()
+    cache_key = data_key_cache_key(file_obj.key_id, file_obj.wrapped_key)
+    data_key = cache.get(cache_key)
+    if data_key is None:
+        data_key = get_keystore().unwrap(file_obj.key_id, file_obj.wrapped_key)
+        cache.set(cache_key, data_key)
+    return data_key
+
+
+def encrypt_for_storage(src, file_instance):
+    """
+    Encrypt ``src`` under a new data key into a staging file and record
+    the wrapped key on ``file_instance``. Returns a StagedFile that
+    storage moves into place when the File is saved.
+    """
+    data_key = generate_stream_key()
+    key_id, wrapped_key = get_keystore().wrap(data_key)
+    file_instance.key_id = key_id
+    file_instance.wrapped_key = wrapped_key
+
+    staging_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+    os.makedirs(staging_dir, exist_ok=True)
+    path = os.path.join(staging_dir, f'{uuid.uuid4().hex}.enc')
+    try:
+        with open(path, 'wb') as dst:
+            encrypt_fileobj(src, dst, data_key)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    # The uploader is likely to read the file back soon
+    get_data_key_cache().set(data_key_cache_key(key_id, wrapped_key), data_key)
+    return StagedFile(path, file_instance.original_name)
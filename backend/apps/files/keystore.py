@@ -0,0 +1,65 @@
+"""
+Master-key stores for envelope encryption.
+
+Each stored file is encrypted with its own random data key. The data key
+is wrapped (RFC 3394 AES key wrap) with a master key held by the key
+store, and only the wrapped form and the master key id are saved on the
+File row. FILE_KEYSTORE_BACKEND selects the store; LocalKeyStore reads
+master keys from settings, and a KMS-backed store only has to implement
+wrap() and unwrap().
+"""
+import base64
+
+from cryptography.hazmat.primitives.keywrap import InvalidUnwrap, aes_key_unwrap, aes_key_wrap
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class KeyStoreError(Exception):
+    pass
+
+
+class BaseKeyStore:
+    def wrap(self, data_key):
+        """Return (key_id, wrapped_key) for a raw data key"""
+        raise NotImplementedError
+
+    def unwrap(self, key_id, wrapped_key):
+        """Return the raw data key"""
+        raise NotImplementedError
+
+
+class LocalKeyStore(BaseKeyStore):
+    """
+    Master keys come from FILE_ENCRYPTION_MASTER_KEYS, a mapping of key id
+    to a urlsafe-base64 encoded 256-bit key. New data keys are wrapped with
+    FILE_ENCRYPTION_ACTIVE_KEY; older ids stay usable for unwrapping, which
+    allows master keys to be rotated.
+    """
+
+    def __init__(self):
+        self.master_keys = {
+            key_id: base64.urlsafe_b64decode(value)
+            for key_id, value in settings.FILE_ENCRYPTION_MASTER_KEYS.items()
+        }
+        self.active_key_id = settings.FILE_ENCRYPTION_ACTIVE_KEY
+
+    def get_master_key(self, key_id):
+        try:
+            return self.master_keys[key_id]
+        except KeyError:
+            raise KeyStoreError(f"Unknown master key: {key_id}")
+
+    def wrap(self, data_key):
+        master_key = self.get_master_key(self.active_key_id)
+        return self.active_key_id, aes_key_wrap(master_key, data_key)
+
+    def unwrap(self, key_id, wrapped_key):
+        try:
+            return aes_key_unwrap(self.get_master_key(key_id), bytes(wrapped_key))
+        except InvalidUnwrap:
+            raise KeyStoreError(f"Could not unwrap data key with master key {key_id}")
+
+
+def get_keystore():
+    return import_string(settings.FILE_KEYSTORE_BACKEND)()
@@ -0,0 +1,205 @@
+"""
+Batched maintenance sweeps.
+
+Each sweep works in batches of ``batch_size`` rows or files, so no single
+statement holds locks for long, and stops once ``time_budget`` seconds
+have passed. A sweep that runs out of time returns ``done=False``;
+running it again picks up where it stopped, so callers can schedule
+sweeps frequently with a small budget instead of rarely with a large one.
+"""
+import os
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from . import uploads
+from .models import Blob, ConsumedLink, File, FileShare, JobLease, SecureLink, UploadSession
+
+# The JobLease row whose cursor records how far the orphan GC got
+GC_JOB_NAME = 'collect_orphaned_blobs'
+
+# Storage prefixes holding blobs, in sorted order, and the model whose
+# ``file`` field references them
+GC_PREFIXES = (
+    ('cas', Blob),
+    ('encrypted', File),
+)
+
+SweepResult = namedtuple('SweepResult', 'deleted done')
+
+
+def get_deadline(time_budget):
+    if time_budget is None:
+        time_budget = settings.MAINTENANCE_TIME_BUDGET
+    return time.monotonic() + time_budget
+
+
+def delete_in_batches(queryset, batch_size, deadline):
+    """
+    Delete the rows of ``queryset`` a batch of primary keys at a time.
+    For models without cascades or delete signals each batch is one
+    DELETE ... WHERE pk IN (...) that does not load the rows.
+    """
+    deleted = 0
+    while True:
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if pks:
+            deleted += queryset.model.objects.filter(pk__in=pks).delete()[0]
+        if len(pks) < batch_size:
+            return SweepResult(deleted, True)
+        if time.monotonic() >= deadline:
+            return SweepResult(deleted, False)
+
+
+def cleanup_expired_links(batch_size=None, time_budget=None):
+    """
+    Delete secure links that expired and are older than 24 hours, and
+    consumed signed-link nonces whose links have expired.
+    """
+    batch_size = batch_size or settings.MAINTENANCE_BATCH_SIZE
+    deadline = get_deadline(time_budget)
+    now = timezone.now()
+
+    links = delete_in_batches(
+        SecureLink.objects.filter(
+            expires_at__lt=now,
+            created_at__lt=now - timezone.timedelta(hours=24)
+        ),
+        batch_size,
+        deadline
+    )
+    if not links.done:
+        return links
+    nonces = delete_in_batches(
+        ConsumedLink.objects.filter(expires_at__lt=now),
+        batch_size,
+        deadline
+    )
+    return SweepResult(links.deleted + nonces.deleted, nonces.done)
+
+
+def prune_expired_shares(batch_size=None, time_budget=None):
+    """
+    Hard-delete shares that expired more than FILE_SHARE_EXPIRED_RETENTION
+    ago. Expired shares already grant no access; this keeps the table and
+    its indexes small.
+    """
+    cutoff = timezone.now() - settings.FILE_SHARE_EXPIRED_RETENTION
+    return delete_in_batches(
+        FileShare.objects.filter(expires_at__lt=cutoff),
+        batch_size or settings.MAINTENANCE_BATCH_SIZE,
+        get_deadline(time_budget)
+    )
+
+
+def cleanup_expired_uploads(batch_size=None, time_budget=None):
+    """Delete abandoned chunked upload sessions and their staged parts"""
+    batch_size = batch_size or settings.MAINTENANCE_BATCH_SIZE
+    deadline = get_deadline(time_budget)
+    expired = UploadSession.objects.filter(expires_at__lt=timezone.now())
+    deleted = 0
+    while True:
+        sessions = list(expired.order_by('pk').only('id')[:batch_size])
+        if sessions:
+            UploadSession.objects.filter(pk__in=[s.pk for s in sessions]).delete()
+            for session in sessions:
+                uploads.discard(session)
+            deleted += len(sessions)
+        if len(sessions) < batch_size:
+            return SweepResult(deleted, True)
+        if time.monotonic() >= deadline:
+            return SweepResult(deleted, False)
+
+
+def iter_storage(prefix, after=None):
+    """
+    Yield the names of the files under ``prefix`` in MEDIA_ROOT in sorted
+    order, skipping names up to and including ``after``.
+    """
+    root = default_storage.path(prefix)
+    if not os.path.isdir(root):
+        return
+
+    def walk(path, name):
+        with os.scandir(path) as it:
+            # Sorting directories as "name/" makes the walk order match
+            # plain string order of the yielded names
+            entries = sorted(it, key=lambda e: e.name + '/' if e.is_dir() else e.name)
+        for entry in entries:
+            entry_name = f'{name}/{entry.name}'
+            if entry.is_dir(follow_symlinks=False):
+                if after and entry_name + '/' < after and not after.startswith(entry_name + '/'):
+                    continue
+                yield from walk(entry.path, entry_name)
+            elif not after or entry_name > after:
+                yield entry_name
+
+    yield from walk(root, prefix)
+
+
+def get_gc_cursor():
+    cursor = JobLease.objects.filter(name=GC_JOB_NAME).values_list('cursor', flat=True).first()
+    return cursor or None
+
+
+def set_gc_cursor(cursor):
+    if not JobLease.objects.filter(name=GC_JOB_NAME).update(cursor=cursor or ''):
+        JobLease.objects.get_or_create(name=GC_JOB_NAME, defaults={'cursor': cursor or ''})
+
+
+def collect_orphaned_blobs(batch_size=None, time_budget=None, grace_period=None,
+                           dry_run=False):
+    """
+    Remove stored blobs that no File or Blob row references.
+
+    Files younger than ``grace_period`` are left alone: an upload writes
+    its blob before the row that references it is committed. The position
+    reached is saved on the job's JobLease row, so a sweep that runs out
+    of time resumes from there next time, whichever node or process runs it.
+    """
+    batch_size = batch_size or settings.MAINTENANCE_BATCH_SIZE
+    deadline = get_deadline(time_budget)
+    if grace_period is None:
+        grace_period = settings.ORPHAN_GC_GRACE_PERIOD
+    cutoff = time.time() - grace_period.total_seconds()
+    cursor = get_gc_cursor()
+    deleted = 0
+
+    for prefix, model in GC_PREFIXES:
+        if cursor and not cursor.startswith(prefix + '/'):
+            if cursor > prefix:
+                continue
+            cursor = None
+        names = iter_storage(prefix, after=cursor)
+        while True:
+            batch = [name for _, name in zip(range(batch_size), names)]
+            if not batch:
+                break
+            referenced = set(
+                model.objects.filter(file__in=batch).values_list('file', flat=True)
+            )
+            for name in batch:
+                if name in referenced:
+                    continue
+                path = default_storage.path(name)
+                try:
+                    if os.path.getmtime(path) > cutoff:
+                        continue
+                    if not dry_run:
+                        os.remove(path)
+                except FileNotFoundError:
+                    continue
+                deleted += 1
+
+            if not dry_run:
+                set_gc_cursor(batch[-1])
+            if time.monotonic() >= deadline:
+                return SweepResult(deleted, False)
+        cursor = None
+
+    if not dry_run:
+        set_gc_cursor(None)
+    return SweepResult(deleted, True)
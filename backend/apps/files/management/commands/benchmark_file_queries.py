@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+
+from apps.files.models import File
+
+User = get_user_model()
+
+EXPECTED_INDEXES = ('file_owner_created_idx', 'fileshare_recipient_file_idx')
+
+
+class Command(BaseCommand):
+    help = 'Prints query plans and timings for the file access query used by FileViewSet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='User whose file listing is benchmarked')
+        parser.add_argument('--iterations', type=int, default=100)
+
+    def timed(self, label, func, iterations):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed = (time.perf_counter() - start) / iterations * 1000
+        self.stdout.write(f'{label}: {elapsed:.3f} ms/query')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['email']} does not exist")
+        iterations = options['iterations']
+
+        listing = File.objects.accessible_to(user).order_by('-created_at')
+        sample = listing.values_list('pk', flat=True).first()
+
+        plans = {'list': listing.explain()}
+        if sample is not None:
+            # get_object() on the download path runs the same query plus a pk filter
+            plans['detail'] = File.objects.accessible_to(user).filter(pk=sample).explain()
+
+        for label, plan in plans.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{label} plan'))
+            self.stdout.write(plan)
+
+        used = [name for name in EXPECTED_INDEXES if name in plans['list']]
+        unused = [name for name in EXPECTED_INDEXES if name not in plans['list']]
+        if used:
+            self.stdout.write(self.style.SUCCESS(f"Indexes used: {', '.join(used)}"))
+        if unused:
+            self.stdout.write(self.style.WARNING(f"Indexes not used: {', '.join(unused)}"))
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'timings ({listing.count()} files)'))
+        self.timed('list', lambda: list(listing.all()), iterations)
+        if sample is not None:
+            self.timed(
+                'detail',
+                lambda: File.objects.accessible_to(user).get(pk=sample),
+                iterations
+            )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.files import maintenance
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired secure links and consumed signed-link nonces in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--time-budget', type=float, help='Seconds to run before stopping')
+
+    def handle(self, *args, **options):
+        result = maintenance.cleanup_expired_links(
+            batch_size=options['batch_size'],
+            time_budget=options['time_budget']
+        )
+        state = 'done' if result.done else 'out of time, run again to continue'
+        self.stdout.write(self.style.SUCCESS(f'Deleted {result.deleted} rows ({state})'))
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.files import maintenance
+
+
+class Command(BaseCommand):
+    help = 'Removes stored blobs that no File or Blob row references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--time-budget', type=float, help='Seconds to run before stopping')
+        parser.add_argument(
+            '--grace-period', type=int,
+            help='Minimum age in seconds of a blob before it may be removed'
+        )
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        grace_period = options['grace_period']
+        result = maintenance.collect_orphaned_blobs(
+            batch_size=options['batch_size'],
+            time_budget=options['time_budget'],
+            grace_period=timedelta(seconds=grace_period) if grace_period is not None else None,
+            dry_run=options['dry_run']
+        )
+        verb = 'Would remove' if options['dry_run'] else 'Removed'
+        state = 'done' if result.done else 'out of time, run again to continue'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {result.deleted} orphaned blobs ({state})'))
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.files import quota
+
+
+class Command(BaseCommand):
+    help = 'Recomputes every user\'s storage usage totals from their files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = (
+            get_user_model().objects.order_by('pk')
+            .values_list('pk', flat=True)
+            .iterator(chunk_size=batch_size)
+        )
+        reconciled = 0
+        batch = []
+        for user_id in user_ids:
+            batch.append(user_id)
+            if len(batch) == batch_size:
+                quota.reconcile(batch)
+                reconciled += len(batch)
+                batch = []
+        if batch:
+            quota.reconcile(batch)
+            reconciled += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled storage usage for {reconciled} users'))
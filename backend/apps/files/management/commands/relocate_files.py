@@ -0,0 +1,66 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.core.files.storage import default_storage
+
+from apps.files.models import File, get_file_path
+
+
+class Command(BaseCommand):
+    help = 'Moves blobs stored under the old flat encrypted/ layout into the sharded layout'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        moved = skipped = missing = 0
+
+        # Deduplicated files live under cas/ and are already sharded
+        files = (
+            File.objects.filter(blob__isnull=True)
+            .only('id', 'file')
+            .order_by('pk')
+            .iterator(chunk_size=batch_size)
+        )
+        for file_obj in files:
+            old_name = file_obj.file.name
+            new_name = get_file_path(file_obj, old_name)
+            if old_name == new_name:
+                skipped += 1
+                continue
+
+            old_path = default_storage.path(old_name)
+            new_path = default_storage.path(new_name)
+            if dry_run:
+                self.stdout.write(f'{old_name} -> {new_name}')
+                moved += 1
+                continue
+
+            # Until the row is updated the blob at new_path is unreferenced,
+            # and a move keeps its mtime, so collect_orphaned_blobs would take
+            # it for an old orphan. Touching it first puts it within the GC's
+            # grace period for the whole move.
+            if os.path.exists(old_path):
+                os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                os.utime(old_path)
+                os.replace(old_path, new_path)
+            elif os.path.exists(new_path):
+                os.utime(new_path)
+            else:
+                # Nothing to move; leave the row alone so it can be investigated
+                self.stdout.write(self.style.WARNING(f'Missing blob for {file_obj.id}: {old_name}'))
+                missing += 1
+                continue
+
+            # A crash between the move and this update is safe to re-run:
+            # the blob is then found at new_path and only the row is updated
+            File.objects.filter(pk=file_obj.pk).update(file=new_name)
+            moved += 1
+
+        verb = 'Would move' if dry_run else 'Moved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {moved} files ({skipped} already relocated, {missing} missing)'
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.files import scheduler
+
+
+class Command(BaseCommand):
+    help = 'Runs the periodic maintenance jobs (link cleanup, orphan GC, share and upload pruning)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run due jobs once and exit (for cron)')
+        parser.add_argument('--tick', type=float, default=30, help='Seconds between checks for due jobs')
+
+    def handle(self, *args, **options):
+        holder = scheduler.get_holder()
+        while True:
+            for name in scheduler.run_pending(holder=holder):
+                self.stdout.write(f'Ran {name}')
+            if options['once']:
+                return
+            time.sleep(options['tick'])
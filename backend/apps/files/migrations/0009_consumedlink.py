@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0008_file_envelope_encryption'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumedLink',
+            fields=[
+                ('nonce', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+    ]
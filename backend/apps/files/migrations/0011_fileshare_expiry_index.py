@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0010_joblease'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fileshare',
+            index=models.Index(fields=['shared_with', 'expires_at'], name='fileshare_recipient_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0012_storageusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='joblease',
+            name='cursor',
+            field=models.CharField(blank=True, max_length=1024),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('files', '0014_uploadsession_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='fileshare',
+            name='fileshare_recipient_file_idx',
+        ),
+        migrations.AddIndex(
+            model_name='fileshare',
+            index=models.Index(fields=['shared_with', 'expires_at', 'file'], name='fileshare_recipient_file_idx'),
+        ),
+    ]
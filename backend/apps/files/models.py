@@ -1,15 +1,51 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
+import hashlib
 import uuid
 import os
 from django.utils import timezone
 from datetime import timedelta
 
+def sharded_path(prefix, key, ext=''):
+    # Two levels of 256 directories each, chosen by a hash of the key, keep
+    # directories small no matter how many blobs are stored
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'{prefix}/{digest[:2]}/{digest[2:4]}/{key}{ext}'
+
 def get_file_path(instance, filename):
-    # Get count of existing files to create incremental filename
-    count = File.objects.count() + 1
+    # The primary key is generated client-side, so it is unique without
+    # querying the database
     ext = os.path.splitext(filename)[1]
-    return f'encrypted/file_{count}{ext}'
+    return sharded_path('encrypted', instance.id.hex, ext)
+
+def get_blob_path(instance, filename):
+    # Content-addressed: the path is derived from the SHA-256 of the bytes
+    digest = instance.sha256
+    return f'cas/{digest[:2]}/{digest[2:4]}/{digest}'
+
+class Blob(models.Model):
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    file = models.FileField(upload_to=get_blob_path)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} refs)"
+
+class FileQuerySet(models.QuerySet):
+    def accessible_to(self, user):
+        """
+        Files owned by or shared with ``user``: the primary keys from a
+        UNION of the owned and the actively shared branch. Each branch is
+        answered by its own index, File(owner, created_at) and
+        FileShare(shared_with, expires_at, file) respectively, which an
+        OR across the two would prevent; no DISTINCT is needed.
+        """
+        # Default orderings are not allowed inside a compound subquery
+        owned_ids = File.objects.order_by().filter(owner=user).values('pk')
+        shared_ids = FileShare.objects.order_by().active().filter(shared_with=user).values('file')
+        return self.filter(pk__in=owned_ids.union(shared_ids, all=True))
 
 class File(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -20,8 +56,19 @@ class File(models.Model):
     )
     original_name = models.CharField(max_length=255)
     file = models.FileField(upload_to=get_file_path)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    blob = models.ForeignKey(
+        Blob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='files'
+    )
     file_type = models.CharField(max_length=100)
     size = models.BigIntegerField()
+    # Envelope encryption at rest: the per-file data key wrapped by master key key_id
+    key_id = models.CharField(max_length=64, blank=True)
+    wrapped_key = models.BinaryField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_shared = models.BooleanField(default=False)
@@ -33,12 +80,21 @@ class File(models.Model):
         related_name='shared_by_files'
     )
 
+    objects = FileQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='file_owner_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.original_name} ({self.file_type})"
 
+    @property
+    def is_encrypted_at_rest(self):
+        return self.wrapped_key is not None
+
 class ShareLink(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     file = models.ForeignKey(File, on_delete=models.CASCADE)
@@ -46,6 +102,14 @@ class ShareLink(models.Model):
     expires_at = models.DateTimeField()
     can_download = models.BooleanField(default=False)
 
+class FileShareQuerySet(models.QuerySet):
+    def active(self):
+        """Shares that have not expired; expires_at=None never expires"""
+        return self.filter(
+            models.Q(expires_at__isnull=True) |
+            models.Q(expires_at__gt=timezone.now())
+        )
+
 class FileShare(models.Model):
     class Permissions(models.TextChoices):
         VIEW = 'VIEW', 'View Only'
@@ -61,7 +125,8 @@ class FileShare(models.Model):
     shared_with = models.ForeignKey(
         settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE, 
-        related_name='received_files'
+        related_name='received_files',
+        db_index=False  # leads fileshare_recipient_file_idx
     )
     permission = models.CharField(
         max_length=10,
@@ -71,8 +136,16 @@ class FileShare(models.Model):
     expires_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = FileShareQuerySet.as_manager()
+
     class Meta:
         unique_together = ('file', 'shared_with')
+        indexes = [
+            models.Index(
+                fields=['shared_with', 'expires_at', 'file'],
+                name='fileshare_recipient_file_idx'
+            ),
+        ]
 
 class SecureLink(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -94,3 +167,167 @@ class SecureLink(models.Model):
             created_by=user,
             expires_at=expires_at
         )
+
+    @classmethod
+    def consumable(cls, link_id):
+        return cls.objects.filter(
+            id=link_id,
+            is_used=False,
+            expires_at__gt=timezone.now()
+        )
+
+    @classmethod
+    def consume(cls, link_id, peek=False):
+        """
+        Claim a single-use link. Returns (link, consumed): ``link`` is loaded
+        together with its file (None if it does not exist) and ``consumed``
+        is True only for the one request whose conditional UPDATE flipped
+        is_used, so concurrent requests cannot both get the file. With
+        ``peek`` the link is only checked, not used up (for HEAD requests).
+        """
+        try:
+            link_id = uuid.UUID(str(link_id))
+        except ValueError:
+            return None, False
+        link = cls.objects.select_related('file').filter(id=link_id).first()
+        if link is None or link.is_used or link.is_expired:
+            return link, False
+        if peek:
+            return link, True
+        consumed = cls.consumable(link_id).update(is_used=True) == 1
+        return link, consumed
+
+    @classmethod
+    async def aconsume(cls, link_id, peek=False):
+        try:
+            link_id = uuid.UUID(str(link_id))
+        except ValueError:
+            return None, False
+        link = await cls.objects.select_related('file').filter(id=link_id).afirst()
+        if link is None or link.is_used or link.is_expired:
+            return link, False
+        if peek:
+            return link, True
+        consumed = await cls.consumable(link_id).aupdate(is_used=True) == 1
+        return link, consumed
+
+class ConsumedLink(models.Model):
+    """
+    Nonce of a single-use signed link that has been used. A row is only
+    needed until the link would have expired anyway.
+    """
+    nonce = models.CharField(max_length=32, primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    @classmethod
+    def consume(cls, nonce, expires_at, peek=False):
+        """
+        Record the nonce; False if another request already consumed it.
+        With ``peek`` the nonce is only checked, not recorded.
+        """
+        if peek:
+            return not cls.objects.filter(nonce=nonce).exists()
+        try:
+            with transaction.atomic():
+                cls.objects.create(nonce=nonce, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        return True
+
+    @classmethod
+    async def aconsume(cls, nonce, expires_at, peek=False):
+        if peek:
+            return not await cls.objects.filter(nonce=nonce).aexists()
+        try:
+            await cls.objects.acreate(nonce=nonce, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        return True
+
+
+class UploadSession(models.Model):
+    class Status(models.TextChoices):
+        UPLOADING = 'UPLOADING', 'Uploading'
+        ASSEMBLING = 'ASSEMBLING', 'Assembling'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    original_name = models.CharField(max_length=255)
+    file_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.UPLOADING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    @property
+    def is_expired(self):
+        return timezone.now() > self.expires_at
+
+    @property
+    def staging_dir(self):
+        return os.path.join(settings.MEDIA_ROOT, 'uploads', str(self.id))
+
+    @classmethod
+    def create_for_user(cls, user, **fields):
+        expires_at = timezone.now() + settings.UPLOAD_SESSION_TTL
+        return cls.objects.create(owner=user, expires_at=expires_at, **fields)
+
+    def start_assembly(self):
+        """
+        Move the session from UPLOADING to ASSEMBLING; False if another
+        request got there first. The conditional UPDATE commits at once,
+        so no row lock is held while the parts are joined.
+        """
+        return type(self).objects.filter(
+            pk=self.pk, status=self.Status.UPLOADING
+        ).update(status=self.Status.ASSEMBLING) == 1
+
+    def cancel_assembly(self):
+        type(self).objects.filter(pk=self.pk).update(status=self.Status.UPLOADING)
+
+
+class JobLease(models.Model):
+    """
+    Schedule, lock and run-time metrics of a maintenance job. A node may
+    only run the job while it holds an unexpired lease, so a job runs on
+    one node at a time however many schedulers are started.
+    """
+    name = models.CharField(max_length=100, primary_key=True)
+    next_run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True)  # seconds
+    last_result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    run_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    # Where a time-budgeted sweep stopped, so the next run on any node resumes there
+    cursor = models.CharField(max_length=1024, blank=True)
+
+
+class StorageUsage(models.Model):
+    """
+    Denormalised per-user storage totals, kept up to date by the File
+    signal handlers so quota checks and usage displays read one row
+    instead of summing File.size.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='storage_usage'
+    )
+    bytes_used = models.BigIntegerField(default=0)
+    file_count = models.IntegerField(default=0)
+    # Per-user override of FILE_STORAGE_QUOTA; null uses the default
+    quota = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def effective_quota(self):
+        return self.quota if self.quota is not None else settings.FILE_STORAGE_QUOTA
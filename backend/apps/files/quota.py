@@ -0,0 +1,75 @@
+"""
+Per-user storage quotas.
+
+StorageUsage holds each user's running totals. The File post_save and
+post_delete handlers adjust them with F() expressions, so concurrent
+uploads and deletes never lose an update, and a quota check is a single
+primary-key read. reconcile() recomputes the totals from File in bulk
+for when they drift (rows changed with bulk or raw queries).
+"""
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from .models import File, StorageUsage
+
+
+def get_usage(user_id):
+    """(bytes_used, quota) for a user; quota None means unlimited"""
+    row = (
+        StorageUsage.objects.filter(user_id=user_id)
+        .values('bytes_used', 'quota')
+        .first()
+    )
+    if row is None:
+        return 0, settings.FILE_STORAGE_QUOTA
+    quota = row['quota'] if row['quota'] is not None else settings.FILE_STORAGE_QUOTA
+    return row['bytes_used'], quota
+
+
+def has_room(user_id, size):
+    """Whether ``size`` more bytes fit in the user's quota"""
+    bytes_used, quota = get_usage(user_id)
+    return quota is None or bytes_used + size <= quota
+
+
+def add_usage(user_id, size, count):
+    """Atomically add ``size`` bytes and ``count`` files (negative to remove)"""
+    updated = StorageUsage.objects.filter(user_id=user_id).update(
+        bytes_used=models.F('bytes_used') + size,
+        file_count=models.F('file_count') + count,
+        updated_at=timezone.now()
+    )
+    # Removals with no row (e.g. files cascading from a deleted user) need
+    # nothing; the first addition creates the row
+    if not updated and count > 0:
+        StorageUsage.objects.get_or_create(user_id=user_id)
+        add_usage(user_id, size, count)
+
+
+def reconcile(user_ids):
+    """
+    Recompute the totals of ``user_ids`` from their files: one aggregate
+    query and one upsert per call
+    """
+    totals = {
+        row['owner']: row
+        for row in File.objects.filter(owner__in=user_ids)
+        .values('owner')
+        .annotate(bytes_used=models.Sum('size'), file_count=models.Count('pk'))
+    }
+    now = timezone.now()
+    StorageUsage.objects.bulk_create(
+        [
+            StorageUsage(
+                user_id=user_id,
+                bytes_used=totals.get(user_id, {}).get('bytes_used', 0),
+                file_count=totals.get(user_id, {}).get('file_count', 0),
+                updated_at=now
+            )
+            for user_id in user_ids
+        ],
+        update_conflicts=True,
+        unique_fields=['user'],
+        update_fields=['bytes_used', 'file_count', 'updated_at']
+    )
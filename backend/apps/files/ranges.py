@@ -0,0 +1,313 @@
+import os
+import re
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+
+from utils.encryption import decrypt_range, decrypted_size, read_stream_header
+
+STREAM_CHUNK_SIZE = 64 * 1024
+MAX_RANGES = 50
+RANGE_SPEC_RE = re.compile(r'^(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def make_etag(size, mtime_ns):
+    """Strong validator derived from the stored blob's size and mtime"""
+    return f'"{size:x}-{mtime_ns:x}"'
+
+
+def parse_range_header(header, size):
+    """
+    Parse a ``Range: bytes=...`` header into a sorted list of inclusive
+    (start, end) pairs with overlapping/adjacent ranges merged.
+
+    Returns None when the header should be ignored (malformed, another
+    unit, too many ranges) and raises RangeNotSatisfiable when none of the
+    ranges overlap the representation.
+    """
+    if not header or size <= 0:
+        return None
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs:
+        return None
+
+    ranges = []
+    for spec in specs.split(','):
+        match = RANGE_SPEC_RE.match(spec.strip())
+        if not match:
+            return None
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+            if last and end < start:
+                return None
+            if start >= size:
+                continue
+            end = min(end, size - 1)
+        elif last:
+            suffix = int(last)
+            if suffix == 0:
+                continue
+            start = max(size - suffix, 0)
+            end = size - 1
+        else:
+            return None
+        ranges.append((start, end))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def if_range_matches(header, etag, last_modified):
+    """
+    A Range is only honoured if If-Range (when present) still matches the
+    current representation. ETags are compared strongly, dates exactly.
+    """
+    if not header:
+        return True
+    header = header.strip()
+    if header.startswith('"'):
+        return header == etag
+    if header.startswith('W/'):
+        return False
+    return parse_http_date_safe(header) == int(last_modified)
+
+
+def if_none_match_matches(header, etag):
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in header.split(',')]
+    return any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+def iter_range(fh, start, end, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield bytes start..end (inclusive) of an open binary file"""
+    fh.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = fh.read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+def multipart_headers(ranges, content_type, size, boundary):
+    """The per-part header blocks of a multipart/byteranges body"""
+    return [
+        (
+            f'\r\n--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('ascii')
+        for start, end in ranges
+    ]
+
+
+def iter_multipart(source, ranges, part_headers, boundary):
+    try:
+        for (start, end), part_header in zip(ranges, part_headers):
+            yield part_header
+            yield from source.iter_range(start, end)
+        yield f'\r\n--{boundary}--\r\n'.encode('ascii')
+    finally:
+        source.close()
+
+
+def _close_after(source, iterator):
+    try:
+        yield from iterator
+    finally:
+        source.close()
+
+
+async def aiter_range(fh, start, end, chunk_size=STREAM_CHUNK_SIZE):
+    """Async iter_range: reads run in a worker thread, not on the event loop"""
+    read = sync_to_async(fh.read, thread_sensitive=False)
+    await sync_to_async(fh.seek, thread_sensitive=False)(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = await read(min(chunk_size, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+async def aiterate(iterator):
+    """Drive a blocking iterator from async code, one step per worker-thread call"""
+    sentinel = object()
+    step = sync_to_async(next, thread_sensitive=False)
+    while True:
+        chunk = await step(iterator, sentinel)
+        if chunk is sentinel:
+            return
+        yield chunk
+
+
+async def aiter_multipart(source, ranges, part_headers, boundary):
+    try:
+        for (start, end), part_header in zip(ranges, part_headers):
+            yield part_header
+            async for chunk in source.aiter_range(start, end):
+                yield chunk
+        yield f'\r\n--{boundary}--\r\n'.encode('ascii')
+    finally:
+        source.close()
+
+
+async def _aclose_after(source, iterator):
+    try:
+        async for chunk in iterator:
+            yield chunk
+    finally:
+        source.close()
+
+
+class FileSource:
+    """The bytes of an open file, as stored"""
+    can_sendfile = True
+
+    def __init__(self, fh):
+        self.fh = fh
+        stat = os.fstat(fh.fileno())
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.mtime_ns = stat.st_mtime_ns
+
+    def iter_range(self, start, end):
+        return iter_range(self.fh, start, end)
+
+    def aiter_range(self, start, end):
+        return aiter_range(self.fh, start, end)
+
+    def close(self):
+        self.fh.close()
+
+
+class DecryptingSource(FileSource):
+    """
+    The plaintext of a file stored in the utils.encryption stream format.
+    Ranges decrypt only the segments they overlap.
+    """
+    can_sendfile = False
+
+    def __init__(self, fh, key):
+        super().__init__(fh)
+        self.key = key
+        self.ciphertext_size = self.size
+        _, segment_size, _ = read_stream_header(fh)
+        self.size = decrypted_size(self.ciphertext_size, segment_size)
+
+    def iter_range(self, start, end):
+        return decrypt_range(self.fh, self.key, start, end, self.ciphertext_size)
+
+    def aiter_range(self, start, end):
+        return aiterate(self.iter_range(start, end))
+
+
+def open_source(fh, key=None):
+    return DecryptingSource(fh, key) if key else FileSource(fh)
+
+
+def file_response(request, fh, content_type, etag=None, key=None, partial=True):
+    """
+    Build the response for a GET of an open binary file, honouring
+    If-None-Match, Range and If-Range. Returns 200, 206, 304 or 416.
+    Pass ``etag`` when a content hash is known; otherwise one is derived
+    from the file's size and mtime. Pass the data ``key`` for files
+    encrypted at rest to serve (ranges of) their plaintext. With
+    ``partial=False`` those headers are ignored and the whole file is
+    always returned with a 200.
+    """
+    return _build_response(request, open_source(fh, key), content_type, etag, False, partial)
+
+
+async def afile_response(request, fh, content_type, etag=None, key=None, partial=True):
+    """file_response for async views; the body is an async iterator"""
+    source = await sync_to_async(open_source, thread_sensitive=False)(fh, key)
+    return _build_response(request, source, content_type, etag, True, partial)
+
+
+def _build_response(request, source, content_type, etag, asynchronous, partial):
+    size = source.size
+    etag = etag or make_etag(size, source.mtime_ns)
+    last_modified = source.mtime
+    validators = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Accept-Ranges': 'bytes' if partial else 'none',
+    }
+
+    if partial and if_none_match_matches(request.headers.get('If-None-Match'), etag):
+        source.close()
+        return HttpResponse(status=304, headers=validators)
+
+    ranges = None
+    if partial and request.method in ('GET', 'HEAD') and if_range_matches(
+            request.headers.get('If-Range'), etag, last_modified):
+        try:
+            ranges = parse_range_header(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            source.close()
+            return HttpResponse(
+                status=416,
+                headers={**validators, 'Content-Range': f'bytes */{size}'}
+            )
+
+    if not ranges and source.can_sendfile and not asynchronous:
+        response = FileResponse(source.fh, content_type=content_type)
+    elif not ranges or len(ranges) == 1:
+        start, end = ranges[0] if ranges else (0, size - 1)
+        if asynchronous:
+            body = _aclose_after(source, source.aiter_range(start, end))
+        else:
+            body = _close_after(source, source.iter_range(start, end))
+        response = StreamingHttpResponse(
+            body,
+            status=206 if ranges else 200,
+            content_type=content_type
+        )
+        if ranges:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        boundary = uuid.uuid4().hex
+        part_headers = multipart_headers(ranges, content_type, size, boundary)
+        length = (
+            sum(len(header) for header in part_headers)
+            + sum(end - start + 1 for start, end in ranges)
+            + len(f'\r\n--{boundary}--\r\n')
+        )
+        multipart = aiter_multipart if asynchronous else iter_multipart
+        response = StreamingHttpResponse(
+            multipart(source, ranges, part_headers, boundary),
+            status=206,
+            content_type=f'multipart/byteranges; boundary={boundary}'
+        )
+        response['Content-Length'] = str(length)
+
+    for header, value in validators.items():
+        response[header] = value
+    return response
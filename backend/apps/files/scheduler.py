@@ -0,0 +1,117 @@
+"""
+Periodic maintenance jobs without a Celery broker.
+
+``manage.py run_scheduler`` loops over JOBS and runs every job that is
+due. Coordination goes through the JobLease table: a node runs a job
+only after a conditional UPDATE hands it the job's lease, so any number
+of schedulers (or ``run_scheduler --once`` from cron on several hosts)
+can run side by side. A node that dies mid-run loses its lease after
+MAINTENANCE_LEASE_TIMEOUT and another node takes over.
+
+Each run records its duration, result and any error on the lease row.
+The next run is scheduled at the job's interval plus a random jitter,
+so jobs that share an interval do not all fire at once.
+"""
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from apps.authentication import revocation
+
+from . import maintenance
+from .models import JobLease
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+
+    @property
+    def interval(self):
+        return settings.MAINTENANCE_SCHEDULE[self.name]
+
+    def next_run_at(self, now):
+        jitter = self.interval * settings.MAINTENANCE_JITTER * random.random()
+        return now + self.interval + jitter
+
+
+JOBS = [
+    Job('cleanup_expired_links', maintenance.cleanup_expired_links),
+    Job('collect_orphaned_blobs', maintenance.collect_orphaned_blobs),
+    Job('prune_expired_shares', maintenance.prune_expired_shares),
+    Job('cleanup_expired_uploads', maintenance.cleanup_expired_uploads),
+    Job('prune_revoked_tokens', revocation.prune_revoked_tokens),
+]
+
+
+def get_holder():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def acquire(job, holder):
+    """Take the job's lease if it is due and nobody holds it"""
+    now = timezone.now()
+    JobLease.objects.get_or_create(name=job.name, defaults={'next_run_at': now})
+    return JobLease.objects.filter(
+        models.Q(locked_until__isnull=True) | models.Q(locked_until__lt=now),
+        name=job.name,
+        next_run_at__lte=now,
+    ).update(
+        locked_by=holder,
+        locked_until=now + settings.MAINTENANCE_LEASE_TIMEOUT,
+        last_started_at=now
+    ) == 1
+
+
+def run_job(job, holder):
+    """Run a job whose lease this holder has acquired and release the lease"""
+    started = time.monotonic()
+    result, error = None, ''
+    try:
+        result = job.func()
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Maintenance job %s failed', job.name)
+    duration = time.monotonic() - started
+
+    fields = {
+        'locked_by': '',
+        'locked_until': None,
+        'next_run_at': job.next_run_at(timezone.now()),
+        'last_duration': duration,
+        'last_error': error,
+        'run_count': models.F('run_count') + 1,
+    }
+    if error:
+        fields['failure_count'] = models.F('failure_count') + 1
+    else:
+        fields['last_result'] = result._asdict()
+        if not result.done:
+            # Out of time budget: continue on the next tick, not the next interval
+            fields['next_run_at'] = timezone.now()
+        logger.info('Maintenance job %s: %s in %.2fs', job.name, result, duration)
+
+    # A run that outlived its lease may have been taken over; leave that alone
+    JobLease.objects.filter(name=job.name, locked_by=holder).update(**fields)
+    return result
+
+
+def run_pending(jobs=None, holder=None):
+    """Run every due job this node can lease; returns the names run"""
+    holder = holder or get_holder()
+    ran = []
+    for job in jobs or JOBS:
+        if acquire(job, holder):
+            run_job(job, holder)
+            ran.append(job.name)
+    return ran
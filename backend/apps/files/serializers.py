@@ -1,10 +1,13 @@
 from rest_framework import serializers
-from .models import File, FileShare, SecureLink
+from .models import File, FileShare, SecureLink, UploadSession
+from .uploads import list_parts
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
-class FileSerializer(serializers.ModelSerializer):
+from utils.metrics import TimedSerializerMixin
+
+class FileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     is_shared = serializers.SerializerMethodField()
     shared_by = serializers.SerializerMethodField()
     permission = serializers.SerializerMethodField()
@@ -15,31 +18,59 @@ class FileSerializer(serializers.ModelSerializer):
                  'created_at', 'is_shared', 'shared_by', 'permission')
         read_only_fields = ('id', 'created_at', 'is_shared', 'shared_by', 'permission')
 
+    def __init__(self, *args, **kwargs):
+        # Optional sparse fieldset; fields that are not requested are dropped
+        # before serialization, so their method fields never run
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
     def get_is_shared(self, obj):
         request = self.context.get('request')
         if not request:
             return False
-        return obj.owner != request.user
+        return obj.owner_id != request.user.id
+
+    def _get_share(self, obj):
+        """
+        The requesting user's share of ``obj``. FileViewSet.get_queryset
+        annotates the share fields, so listings read them from the row
+        instead of querying per file.
+        """
+        if hasattr(obj, 'share_permission'):
+            if obj.share_permission is None:
+                return None
+            return {
+                'permission': obj.share_permission,
+                'shared_by': obj.share_shared_by,
+            }
+        share = (
+            obj.shares.active().filter(shared_with=self.context['request'].user)
+            .values('permission', 'shared_by__email')
+            .first()
+        )
+        if share is None:
+            return None
+        return {
+            'permission': share['permission'],
+            'shared_by': share['shared_by__email'],
+        }
 
     def get_shared_by(self, obj):
         request = self.context.get('request')
-        if not request or obj.owner == request.user:
-            return None
-        try:
-            share = obj.shares.get(shared_with=request.user)
-            return share.shared_by.email
-        except FileShare.DoesNotExist:
+        if not request or obj.owner_id == request.user.id:
             return None
+        share = self._get_share(obj)
+        return share['shared_by'] if share else None
 
     def get_permission(self, obj):
         request = self.context.get('request')
-        if not request or obj.owner == request.user:
-            return None
-        try:
-            share = obj.shares.get(shared_with=request.user)
-            return share.permission
-        except FileShare.DoesNotExist:
+        if not request or obj.owner_id == request.user.id:
             return None
+        share = self._get_share(obj)
+        return share['permission'] if share else None
 
     def validate(self, attrs):
         file_obj = self.context['request'].FILES.get('file')
@@ -131,3 +162,66 @@ class SecureLinkSerializer(serializers.ModelSerializer):
         return request.build_absolute_uri(
             reverse('files:access-secure-link', kwargs={'pk': obj.id})
         )
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    parts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ('id', 'original_name', 'file_type', 'size', 'status',
+                 'created_at', 'expires_at', 'parts')
+        read_only_fields = ('id', 'status', 'created_at', 'expires_at', 'parts')
+
+    def get_parts(self, obj):
+        return list_parts(obj)
+
+    def validate_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("File size must be positive")
+        if value > settings.MAX_CHUNKED_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                f"File size cannot exceed {settings.MAX_CHUNKED_UPLOAD_SIZE/1024/1024}MB")
+        return value
+
+    def validate_file_type(self, value):
+        if value not in settings.ALLOWED_MIME_TYPES:
+            raise serializers.ValidationError(f"File type {value} is not supported")
+        return value
+
+
+class SignedLinkSerializer(serializers.Serializer):
+    permission = serializers.ChoiceField(
+        choices=FileShare.Permissions.choices,
+        default=FileShare.Permissions.VIEW
+    )
+    single_use = serializers.BooleanField(default=False)
+
+
+class BulkShareSerializer(serializers.Serializer):
+    files = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
+    emails = serializers.ListField(child=serializers.EmailField(), allow_empty=False)
+    permission = serializers.ChoiceField(
+        choices=FileShare.Permissions.choices,
+        default=FileShare.Permissions.VIEW
+    )
+    expires_at = serializers.DateTimeField(required=False, allow_null=True, default=None)
+
+    def validate(self, attrs):
+        # Duplicates would collide inside the single upsert
+        attrs['files'] = list(dict.fromkeys(attrs['files']))
+        attrs['emails'] = list(dict.fromkeys(attrs['emails']))
+        if len(attrs['files']) * len(attrs['emails']) > settings.FILE_BULK_SHARE_MAX_ITEMS:
+            raise serializers.ValidationError(
+                f"Cannot create more than {settings.FILE_BULK_SHARE_MAX_ITEMS} shares at once")
+        return attrs
+
+
+class BulkFileSerializer(serializers.Serializer):
+    files = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False,
+        max_length=settings.FILE_BULK_MAX_FILES
+    )
+
+    def validate_files(self, value):
+        return list(dict.fromkeys(value))
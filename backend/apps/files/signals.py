@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import access, quota
+from .blobs import release_blob
+from .models import File, FileShare
+
+
+@receiver(post_delete, sender=File)
+def release_file_blob(sender, instance, **kwargs):
+    """Deleting a deduplicated File drops its blob reference, not the bytes"""
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+
+
+@receiver(post_delete, sender=File)
+def delete_file_content(sender, instance, **kwargs):
+    """A File that does not share a blob owns its bytes; remove them on commit"""
+    if not instance.blob_id and instance.file:
+        storage, name = instance.file.storage, instance.file.name
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_delete, sender=File)
+def invalidate_owner_access(sender, instance, **kwargs):
+    # Recipients are invalidated by the cascade-deleted FileShare rows
+    access.invalidate(instance.pk, instance.owner_id)
+
+
+@receiver(post_save, sender=File)
+def add_storage_usage(sender, instance, created, **kwargs):
+    if created:
+        quota.add_usage(instance.owner_id, instance.size, 1)
+
+
+@receiver(post_delete, sender=File)
+def remove_storage_usage(sender, instance, **kwargs):
+    quota.add_usage(instance.owner_id, -instance.size, -1)
+
+
+@receiver(post_save, sender=FileShare)
+@receiver(post_delete, sender=FileShare)
+def invalidate_share_access(sender, instance, **kwargs):
+    access.invalidate(instance.file_id, instance.shared_with_id)
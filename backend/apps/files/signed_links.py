@@ -0,0 +1,67 @@
+"""
+Stateless signed secure links.
+
+A signed link carries the file id, expiry, permission and a random nonce
+in the URL, signed with SECRET_KEY through django.core.signing. Checking
+one is CPU-only: no SecureLink row is written when it is created or read
+when it is used. Single-use links additionally record their nonce in
+ConsumedLink the first time they are used; those rows can be pruned once
+the link has expired.
+"""
+import secrets
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+import uuid
+
+from django.core import signing
+from django.utils import timezone
+
+from .models import FileShare
+
+SALT = 'apps.files.signed-link'
+
+SignedLink = namedtuple('SignedLink', 'file_id expires_at permission nonce single_use')
+
+
+class InvalidSignedLink(Exception):
+    pass
+
+
+class ExpiredSignedLink(InvalidSignedLink):
+    pass
+
+
+def make_token(file, permission=FileShare.Permissions.VIEW, single_use=False,
+               expires_in_minutes=60):
+    """Return (token, expires_at) for a link to the file"""
+    expires_at = timezone.now() + timedelta(minutes=expires_in_minutes)
+    payload = {
+        'f': file.id.hex,
+        'e': int(expires_at.timestamp()),
+        'p': permission,
+        'n': secrets.token_urlsafe(12),
+    }
+    if single_use:
+        payload['u'] = 1
+    return signing.dumps(payload, salt=SALT), expires_at
+
+
+def load_token(token):
+    """
+    Verify a token and return its SignedLink. Raises InvalidSignedLink if
+    the signature or payload is bad and ExpiredSignedLink once it expired.
+    """
+    try:
+        payload = signing.loads(token, salt=SALT)
+        link = SignedLink(
+            file_id=uuid.UUID(payload['f']),
+            expires_at=datetime.fromtimestamp(payload['e'], tz=dt_timezone.utc),
+            permission=FileShare.Permissions(payload['p']),
+            nonce=payload['n'],
+            single_use=bool(payload.get('u')),
+        )
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidSignedLink()
+    if timezone.now() > link.expires_at:
+        raise ExpiredSignedLink()
+    return link
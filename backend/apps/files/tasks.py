@@ -1,14 +1,45 @@
-from celery import shared_task
-from django.utils import timezone
-from .models import SecureLink
+try:
+    from celery import shared_task
+except ImportError:
+    # Celery is optional; without it these run through manage.py run_scheduler
+    def shared_task(func):
+        return func
+
+from apps.authentication import revocation
+
+from . import maintenance
 
 @shared_task
 def cleanup_expired_links():
     """
     Delete expired secure links that are older than 24 hours
     """
-    expired_time = timezone.now() - timezone.timedelta(hours=24)
-    SecureLink.objects.filter(
-        expires_at__lt=timezone.now(),
-        created_at__lt=expired_time
-    ).delete() 
\ No newline at end of file
+    return maintenance.cleanup_expired_links().deleted
+
+@shared_task
+def collect_orphaned_blobs():
+    """
+    Remove stored blobs that are no longer referenced by any file
+    """
+    return maintenance.collect_orphaned_blobs().deleted
+
+@shared_task
+def prune_expired_shares():
+    """
+    Delete file shares that expired long ago
+    """
+    return maintenance.prune_expired_shares().deleted
+
+@shared_task
+def cleanup_expired_uploads():
+    """
+    Delete abandoned chunked upload sessions
+    """
+    return maintenance.cleanup_expired_uploads().deleted
+
+@shared_task
+def prune_revoked_tokens():
+    """
+    Delete revocation records of refresh tokens that have expired
+    """
+    return revocation.prune_revoked_tokens().deleted
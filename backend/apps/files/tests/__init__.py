@@ -0,0 +1,44 @@
+import shutil
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from apps.files.models import File
+
+
+def create_file(owner, name='file.txt', data=b'data', file_type='text/plain'):
+    """Create a File owned by ``owner`` whose bytes are saved to storage"""
+    return File.objects.create(
+        owner=owner,
+        original_name=name,
+        file=ContentFile(data, name=name),
+        file_type=file_type,
+        size=len(data)
+    )
+
+
+def use_temporary_media_root(test):
+    """Point MEDIA_ROOT at a new directory until ``test``'s cleanups run"""
+    media_root = tempfile.mkdtemp()
+    media = override_settings(MEDIA_ROOT=media_root)
+    media.enable()
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    test.addCleanup(media.disable)
+    return media_root
+
+
+class MediaTestCase(TestCase):
+    """
+    TestCase whose files are stored in a temporary MEDIA_ROOT, shared by
+    the tests of the class and removed after them. Tests that scan the
+    whole of storage call use_temporary_media_root(self) in setUp instead.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=cls.media_root)
+        media.enable()
+        cls.addClassCleanup(shutil.rmtree, cls.media_root, ignore_errors=True)
+        cls.addClassCleanup(media.disable)
+        super().setUpClass()
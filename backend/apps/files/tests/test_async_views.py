@@ -0,0 +1,114 @@
+from asgiref.sync import iscoroutinefunction
+
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.authentication.models import User
+from apps.files import async_views, signed_links
+from apps.files.models import FileShare, SecureLink
+from apps.files.tests import MediaTestCase, create_file
+
+DATA = bytes(range(100))
+
+
+async def read(response):
+    return b''.join([chunk async for chunk in response.streaming_content])
+
+
+class AsyncDownloadTests(MediaTestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', password='pass')
+        self.other = User.objects.create_user(email='other@example.com', password='pass')
+        self.file = create_file(self.owner, 'data.bin', data=DATA, file_type='application/octet-stream')
+        self.link = SecureLink.create_for_file(self.file, self.owner)
+        self.url = f'/api/async/files/{self.file.id}/download/'
+        self.client = AsyncClient()
+
+    def auth(self, user):
+        return {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    async def test_owner_downloads_the_file(self):
+        response = await self.client.get(self.url, headers=self.auth(self.owner))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="data.bin"')
+        self.assertEqual(await read(response), DATA)
+
+    async def test_range_request(self):
+        headers = {**self.auth(self.owner), 'Range': 'bytes=10-19'}
+        response = await self.client.get(self.url, headers=headers)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(await read(response), DATA[10:20])
+
+    async def test_shared_user_downloads_the_file(self):
+        await FileShare.objects.acreate(
+            file=self.file,
+            shared_by=self.owner,
+            shared_with=self.other,
+            permission=FileShare.Permissions.VIEW
+        )
+        response = await self.client.get(self.url, headers=self.auth(self.other))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await read(response), DATA)
+
+    async def test_unauthenticated(self):
+        response = await self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.client.get(self.url, headers={'Authorization': 'Bearer invalid'})
+        self.assertEqual(response.status_code, 401)
+
+    async def test_no_access(self):
+        response = await self.client.get(self.url, headers=self.auth(self.other))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_unsafe_methods_are_rejected(self):
+        response = await self.client.post(self.url, headers=self.auth(self.owner))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'GET, HEAD')
+
+    def test_views_stay_coroutine_functions(self):
+        # Django serves a view asynchronously only if it still looks like one
+        for view in (
+            async_views.download,
+            async_views.access_secure_link,
+            async_views.access_signed_link,
+        ):
+            with self.subTest(view=view.__name__):
+                self.assertTrue(iscoroutinefunction(view))
+
+    async def test_secure_link_is_single_use(self):
+        url = f'/api/async/files/secure-link/{self.link.id}/'
+
+        self.assertEqual((await self.client.head(url)).status_code, 200)
+        response = await self.client.get(url, headers={'Range': 'bytes=0-0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(await read(response), DATA)
+        self.assertEqual((await self.client.get(url)).status_code, 410)
+
+    async def test_signed_link(self):
+        token, _ = signed_links.make_token(self.file, permission=FileShare.Permissions.DOWNLOAD)
+        url = f'/api/async/files/signed-link/{token}/'
+
+        response = await self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+        self.assertEqual(await read(response), DATA)
+
+        response = await self.client.get(url[:-2] + 'x/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_single_use_signed_link(self):
+        token, _ = signed_links.make_token(self.file, single_use=True)
+        url = f'/api/async/files/signed-link/{token}/'
+
+        response = await self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Disposition'].startswith('inline'))
+        self.assertEqual(await read(response), DATA)
+        self.assertEqual((await self.client.get(url)).status_code, 410)
+
+    async def test_expired_signed_link(self):
+        token, _ = signed_links.make_token(self.file, expires_in_minutes=-1)
+        response = await self.client.get(f'/api/async/files/signed-link/{token}/')
+        self.assertEqual(response.status_code, 410)
@@ -0,0 +1,59 @@
+import base64
+import os
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from apps.authentication.models import User
+from apps.files.models import File
+from apps.files.tests import MediaTestCase, create_file
+
+
+class DeliveryBackendTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.file = create_file(self.user, 'report.txt')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, file_obj=None):
+        file_obj = file_obj or self.file
+        return self.client.get(f'/api/files/{file_obj.id}/download/')
+
+    def test_streaming_delivery(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'data')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="report.txt"')
+
+    @override_settings(
+        FILE_DELIVERY_BACKEND='apps.files.delivery.XAccelRedirectDelivery',
+        FILE_DELIVERY_INTERNAL_URL='/protected/'
+    )
+    def test_x_accel_redirect(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{self.file.file.name}')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="report.txt"')
+
+    @override_settings(FILE_DELIVERY_BACKEND='apps.files.delivery.XSendfileDelivery')
+    def test_x_sendfile(self):
+        response = self.download()
+        self.assertEqual(response['X-Sendfile'], self.file.file.path)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(
+        FILE_DELIVERY_BACKEND='apps.files.delivery.XAccelRedirectDelivery',
+        FILE_ENCRYPTION_AT_REST=True,
+        FILE_ENCRYPTION_MASTER_KEYS={'default': base64.urlsafe_b64encode(os.urandom(32)).decode()}
+    )
+    def test_encrypted_files_are_streamed_by_django(self):
+        upload = SimpleUploadedFile('secret.txt', b'plaintext', content_type='text/plain')
+        self.client.post('/api/files/', {'file': upload}, format='multipart')
+        encrypted = File.objects.get(original_name='secret.txt')
+
+        response = self.download(encrypted)
+        self.assertNotIn('X-Accel-Redirect', response)
+        self.assertEqual(b''.join(response.streaming_content), b'plaintext')
@@ -0,0 +1,119 @@
+import base64
+import io
+import os
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.authentication.models import User
+from apps.files.keystore import KeyStoreError, LocalKeyStore
+from apps.files.models import File
+from apps.files.tests import MediaTestCase
+from utils.encryption import decrypt_range, decrypted_size, encrypt_stream, generate_stream_key
+
+SEGMENT_SIZE = 16
+MASTER_KEYS = {
+    'old': base64.urlsafe_b64encode(os.urandom(32)).decode(),
+    'new': base64.urlsafe_b64encode(os.urandom(32)).decode(),
+}
+
+
+def encrypt(data, key):
+    return b''.join(encrypt_stream(io.BytesIO(data), key, SEGMENT_SIZE))
+
+
+class RangeDecryptionTests(SimpleTestCase):
+    def setUp(self):
+        self.key = generate_stream_key()
+
+    def test_decrypted_size(self):
+        for size in (0, 1, SEGMENT_SIZE, 3 * SEGMENT_SIZE, 3 * SEGMENT_SIZE + 5):
+            with self.subTest(size=size):
+                ciphertext = encrypt(os.urandom(size), self.key)
+                self.assertEqual(decrypted_size(len(ciphertext), SEGMENT_SIZE), size)
+
+    def test_decrypt_range(self):
+        data = os.urandom(3 * SEGMENT_SIZE + 5)
+        ciphertext = encrypt(data, self.key)
+        ranges = [
+            (0, len(data) - 1),
+            (10, 40),  # spans three segments
+            (SEGMENT_SIZE, 2 * SEGMENT_SIZE - 1),  # exactly one segment
+            (SEGMENT_SIZE - 1, SEGMENT_SIZE),  # straddles a boundary
+            (len(data) - 1, len(data) - 1),  # inside the short last segment
+        ]
+        for start, end in ranges:
+            with self.subTest(start=start, end=end):
+                plaintext = b''.join(decrypt_range(
+                    io.BytesIO(ciphertext), self.key, start, end, len(ciphertext)
+                ))
+                self.assertEqual(plaintext, data[start:end + 1])
+
+
+@override_settings(FILE_ENCRYPTION_MASTER_KEYS=MASTER_KEYS, FILE_ENCRYPTION_ACTIVE_KEY='new')
+class LocalKeyStoreTests(SimpleTestCase):
+    def test_wrap_round_trip(self):
+        keystore = LocalKeyStore()
+        data_key = generate_stream_key()
+        key_id, wrapped_key = keystore.wrap(data_key)
+        self.assertEqual(key_id, 'new')
+        self.assertNotEqual(wrapped_key, data_key)
+        self.assertEqual(keystore.unwrap(key_id, wrapped_key), data_key)
+
+    def test_wrong_master_key_fails(self):
+        keystore = LocalKeyStore()
+        _, wrapped_key = keystore.wrap(generate_stream_key())
+        with self.assertRaises(KeyStoreError):
+            keystore.unwrap('old', wrapped_key)
+        with self.assertRaises(KeyStoreError):
+            keystore.unwrap('missing', wrapped_key)
+
+    def test_tampered_wrapped_key_fails(self):
+        keystore = LocalKeyStore()
+        key_id, wrapped_key = keystore.wrap(generate_stream_key())
+        tampered = bytes([wrapped_key[0] ^ 1]) + wrapped_key[1:]
+        with self.assertRaises(KeyStoreError):
+            keystore.unwrap(key_id, tampered)
+
+
+@override_settings(
+    FILE_ENCRYPTION_AT_REST=True,
+    FILE_ENCRYPTION_MASTER_KEYS=MASTER_KEYS,
+    FILE_ENCRYPTION_ACTIVE_KEY='new'
+)
+class EncryptionAtRestTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.data = os.urandom(150 * 1024)  # three 64KB segments, the last partial
+
+    def upload(self):
+        upload = SimpleUploadedFile('data.bin', self.data, content_type='application/octet-stream')
+        return self.client.post('/api/files/', {'file': upload}, format='multipart')
+
+    def test_upload_is_encrypted_and_range_download_decrypts(self):
+        self.assertEqual(self.upload().status_code, 201)
+        file_obj = File.objects.get()
+        self.assertTrue(file_obj.is_encrypted_at_rest)
+        with file_obj.file.open('rb') as fh:
+            stored = fh.read()
+        self.assertTrue(stored.startswith(b'FSE1'))
+        self.assertNotIn(self.data[:1024], stored)
+
+        response = self.client.get(
+            f'/api/files/{file_obj.id}/download/', HTTP_RANGE='bytes=65000-140000'
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 65000-140000/{len(self.data)}')
+        self.assertEqual(b''.join(response.streaming_content), self.data[65000:140001])
+
+    def test_failed_save_removes_the_staged_file(self):
+        with mock.patch.object(File, 'save', side_effect=DatabaseError('insert failed')):
+            self.assertEqual(self.upload().status_code, 400)
+        staging_dir = os.path.join(settings.MEDIA_ROOT, 'uploads')
+        self.assertEqual(os.listdir(staging_dir), [])
@@ -0,0 +1,81 @@
+import os
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.authentication.models import User
+from apps.files import maintenance, scheduler
+from apps.files.models import JobLease, SecureLink
+from apps.files.tests import create_file, use_temporary_media_root
+
+
+class MaintenanceTests(TestCase):
+    def setUp(self):
+        # A fresh MEDIA_ROOT per test, since the sweeps walk all of it
+        use_temporary_media_root(self)
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.file = create_file(self.user)
+
+    def test_cleanup_expired_links_in_batches(self):
+        for _ in range(5):
+            SecureLink.create_for_file(self.file, self.user)
+        live = SecureLink.create_for_file(self.file, self.user)
+        SecureLink.objects.exclude(pk=live.pk).update(
+            created_at=timezone.now() - timedelta(days=2),
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+
+        result = maintenance.cleanup_expired_links(batch_size=2)
+
+        self.assertEqual(result, maintenance.SweepResult(5, True))
+        self.assertEqual(list(SecureLink.objects.values_list('pk', flat=True)), [live.pk])
+
+    def test_collect_orphaned_blobs_resumes(self):
+        orphans = [
+            default_storage.save(f'encrypted/0{i}/00/orphan{i}.txt', ContentFile(b'x'))
+            for i in range(3)
+        ]
+
+        first = maintenance.collect_orphaned_blobs(
+            batch_size=1, time_budget=0, grace_period=timedelta(0)
+        )
+        self.assertEqual(first, maintenance.SweepResult(1, False))
+        # The cursor is in the database, so another process would resume too
+        self.assertEqual(JobLease.objects.get(name='collect_orphaned_blobs').cursor, orphans[0])
+
+        rest = maintenance.collect_orphaned_blobs(grace_period=timedelta(0))
+        self.assertEqual(rest, maintenance.SweepResult(2, True))
+        for name in orphans:
+            self.assertFalse(default_storage.exists(name))
+        self.assertTrue(os.path.exists(self.file.file.path))
+        self.assertIsNone(maintenance.get_gc_cursor())
+
+    def test_collect_orphaned_blobs_honours_grace_period(self):
+        name = default_storage.save('encrypted/00/00/orphan.txt', ContentFile(b'x'))
+        result = maintenance.collect_orphaned_blobs()
+        self.assertEqual(result.deleted, 0)
+        self.assertTrue(default_storage.exists(name))
+
+
+class SchedulerTests(TestCase):
+    def setUp(self):
+        use_temporary_media_root(self)
+
+    def test_due_jobs_run_once_per_interval(self):
+        names = [job.name for job in scheduler.JOBS]
+        self.assertEqual(scheduler.run_pending(holder='a'), names)
+        self.assertEqual(scheduler.run_pending(holder='b'), [])
+
+        lease = JobLease.objects.get(name='cleanup_expired_links')
+        self.assertEqual(lease.run_count, 1)
+        self.assertEqual(lease.last_result, {'deleted': 0, 'done': True})
+        self.assertGreater(lease.next_run_at, timezone.now())
+        self.assertIsNone(lease.locked_until)
+
+    def test_leased_job_is_skipped(self):
+        job = scheduler.JOBS[0]
+        self.assertTrue(scheduler.acquire(job, 'a'))
+        self.assertFalse(scheduler.acquire(job, 'b'))
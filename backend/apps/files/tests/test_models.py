@@ -0,0 +1,102 @@
+import unittest
+from datetime import timedelta
+
+from django.db import connection, models
+from django.utils import timezone
+
+from apps.authentication.models import User
+from apps.files.models import File, FileShare, SecureLink
+from apps.files.tests import MediaTestCase, create_file
+
+
+class SecureLinkConsumeTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.file = create_file(self.user)
+        self.link = SecureLink.create_for_file(self.file, self.user)
+
+    def test_link_is_consumed_once(self):
+        link, consumed = SecureLink.consume(self.link.id)
+        self.assertTrue(consumed)
+        self.assertEqual(link.file, self.file)
+
+        link, consumed = SecureLink.consume(self.link.id)
+        self.assertFalse(consumed)
+        self.assertTrue(link.is_used)
+
+    def test_stale_read_loses_the_race(self):
+        # Another request consumed the link after this one loaded it
+        stale = SecureLink.consumable(self.link.id).first()
+        SecureLink.consume(self.link.id)
+        self.assertEqual(SecureLink.consumable(stale.id).update(is_used=True), 0)
+
+    def test_expired_link_is_not_consumed(self):
+        SecureLink.objects.filter(pk=self.link.pk).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        link, consumed = SecureLink.consume(self.link.id)
+        self.assertFalse(consumed)
+        self.assertTrue(link.is_expired)
+        self.assertFalse(SecureLink.objects.get(pk=self.link.pk).is_used)
+
+    def test_unknown_link(self):
+        self.assertEqual(SecureLink.consume('not-a-uuid'), (None, False))
+
+
+class AccessibleToTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='user@example.com', password='pass')
+        self.other = User.objects.create_user(email='other@example.com', password='pass')
+        self.third = User.objects.create_user(email='third@example.com', password='pass')
+
+        self.owned = create_file(self.user)
+        self.owned_and_shared_out = create_file(self.user)
+        self.share(self.owned_and_shared_out, self.other)
+        self.share(self.owned_and_shared_out, self.third)
+        self.shared_in = create_file(self.other)
+        self.share(self.shared_in, self.user)
+        self.share(self.shared_in, self.third)
+        self.expired = create_file(self.other)
+        self.share(self.expired, self.user, expires_at=timezone.now() - timedelta(minutes=1))
+        self.foreign = create_file(self.other)
+        self.share(self.foreign, self.third)
+
+    def share(self, file_obj, user, expires_at=None):
+        FileShare.objects.create(
+            file=file_obj,
+            shared_by=file_obj.owner,
+            shared_with=user,
+            permission=FileShare.Permissions.VIEW,
+            expires_at=expires_at
+        )
+
+    def test_owned_and_unexpired_shared_files(self):
+        pks = list(File.objects.accessible_to(self.user).values_list('pk', flat=True))
+        self.assertEqual(len(pks), len(set(pks)))  # no DISTINCT needed
+        self.assertEqual(
+            set(pks), {self.owned.pk, self.owned_and_shared_out.pk, self.shared_in.pk}
+        )
+
+    def test_matches_the_or_join_query_it_replaced(self):
+        FileShare.objects.filter(file=self.expired).delete()  # it predates share expiry
+        for user in (self.user, self.other, self.third):
+            with self.subTest(user=user.email):
+                old = File.objects.filter(
+                    models.Q(owner=user) | models.Q(shares__shared_with=user)
+                ).distinct()
+                self.assertEqual(
+                    set(File.objects.accessible_to(user).values_list('pk', flat=True)),
+                    set(old.values_list('pk', flat=True))
+                )
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN output is SQLite-specific')
+    def test_each_branch_uses_its_index(self):
+        plan = File.objects.accessible_to(self.user).order_by('-created_at').explain()
+        self.assertIn('file_owner_created_idx', plan)
+        self.assertIn('COVERING INDEX fileshare_recipient_file_idx', plan)
+
+    def test_composes_with_filters_and_ordering(self):
+        queryset = File.objects.accessible_to(self.user)
+        self.assertEqual(queryset.get(pk=self.shared_in.pk), self.shared_in)
+        self.assertFalse(queryset.filter(pk=self.foreign.pk).exists())
+        self.assertEqual(queryset.count(), 3)
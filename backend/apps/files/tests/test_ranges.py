@@ -0,0 +1,123 @@
+from django.test import SimpleTestCase
+from rest_framework.test import APIClient
+
+from apps.authentication.models import User
+from apps.files.models import SecureLink
+from apps.files.ranges import RangeNotSatisfiable, parse_range_header
+from apps.files.tests import MediaTestCase, create_file
+
+DATA = bytes(range(100))
+
+
+class ParseRangeHeaderTests(SimpleTestCase):
+    def test_ranges_are_clamped_sorted_and_merged(self):
+        self.assertEqual(
+            parse_range_header('bytes=50-, 0-9, 5-14, -10', 100),
+            [(0, 14), (50, 99)]
+        )
+
+    def test_malformed_headers_are_ignored(self):
+        for header in ('items=0-1', 'bytes=5-1', 'bytes=a-b', 'bytes=-'):
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range_header(header, 100))
+
+    def test_unsatisfiable(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range_header('bytes=100-200', 100)
+
+
+class RangeDownloadTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.file = create_file(self.user, 'data.bin', data=DATA, file_type='application/octet-stream')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, **headers):
+        return self.client.get(f'/api/files/{self.file.id}/download/', headers=headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_full_download_advertises_ranges(self):
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), DATA)
+
+    def test_single_range(self):
+        response = self.download(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+        self.assertEqual(self.body(response), DATA[10:20])
+
+    def test_suffix_range(self):
+        response = self.download(Range='bytes=-5')
+        self.assertEqual(response['Content-Range'], 'bytes 95-99/100')
+        self.assertEqual(self.body(response), DATA[95:])
+
+    def test_multiple_ranges(self):
+        response = self.download(Range='bytes=0-4,50-54')
+        self.assertEqual(response.status_code, 206)
+        content_type, _, boundary = response['Content-Type'].partition('; boundary=')
+        self.assertEqual(content_type, 'multipart/byteranges')
+
+        body = self.body(response)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        parts = body.split(f'--{boundary}'.encode())
+        self.assertEqual(parts[-1], b'--\r\n')
+        self.assertEqual(len(parts), 4)  # preamble, two parts, closing delimiter
+        for part, (start, end) in zip(parts[1:3], [(0, 4), (50, 54)]):
+            headers, _, content = part.partition(b'\r\n\r\n')
+            self.assertIn(f'Content-Range: bytes {start}-{end}/100'.encode(), headers)
+            self.assertEqual(content, DATA[start:end + 1] + b'\r\n')
+
+    def test_unsatisfiable_range(self):
+        response = self.download(Range='bytes=100-200')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+    def test_if_range(self):
+        etag = self.download()['ETag']
+
+        response = self.download(Range='bytes=0-9', **{'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+
+        response = self.download(Range='bytes=0-9', **{'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), DATA)
+
+    def test_if_none_match(self):
+        etag = self.download()['ETag']
+        self.assertEqual(self.download(**{'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(self.download(**{'If-None-Match': '"stale"'}).status_code, 200)
+
+
+class SingleUseLinkProbeTests(MediaTestCase):
+    def setUp(self):
+        user = User.objects.create_user(email='owner@example.com', password='pass')
+        file_obj = create_file(user, 'data.bin', data=DATA, file_type='application/octet-stream')
+        self.link = SecureLink.create_for_file(file_obj, user)
+        self.url = f'/api/files/secure-link/{self.link.id}/'
+        self.client = APIClient()
+
+    def test_range_request_gets_the_whole_file(self):
+        response = self.client.get(self.url, headers={'Range': 'bytes=0-0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'none')
+        self.assertEqual(b''.join(response.streaming_content), DATA)
+        self.assertEqual(self.client.get(self.url).status_code, 410)
+
+    def test_conditional_request_gets_the_whole_file(self):
+        response = self.client.get(self.url, headers={'If-None-Match': '*'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), DATA)
+
+    def test_head_does_not_use_up_the_link(self):
+        self.assertEqual(self.client.head(self.url).status_code, 200)
+        self.link.refresh_from_db()
+        self.assertFalse(self.link.is_used)
+
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.assertEqual(self.client.head(self.url).status_code, 410)
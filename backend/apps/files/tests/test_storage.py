@@ -0,0 +1,129 @@
+import io
+import os
+import time
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import DatabaseError
+from django.db.models import QuerySet
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from apps.authentication.models import User
+from apps.files.maintenance import collect_orphaned_blobs
+from apps.files.models import Blob, File, get_file_path
+from apps.files.tests import MediaTestCase, create_file
+
+
+@override_settings(FILE_STORAGE_DEDUP=True)
+class DeduplicationTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, data):
+        upload = SimpleUploadedFile(name, data, content_type='text/plain')
+        response = self.client.post('/api/files/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return File.objects.get(pk=response.data['id'])
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.upload('a.txt', b'same bytes')
+        second = self.upload('b.txt', b'same bytes')
+        other = self.upload('c.txt', b'other bytes')
+
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(first.file.name.startswith('cas/'))
+        self.assertNotEqual(other.blob_id, first.blob_id)
+        self.assertEqual(Blob.objects.get(pk=first.blob_id).ref_count, 2)
+
+    def test_bytes_are_deleted_with_the_last_reference(self):
+        first = self.upload('a.txt', b'same bytes')
+        second = self.upload('b.txt', b'same bytes')
+        name = first.file.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(Blob.objects.get(pk=second.blob_id).ref_count, 1)
+        self.assertTrue(default_storage.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(Blob.objects.exists())
+        self.assertFalse(default_storage.exists(name))
+
+
+class ShardedLayoutTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+
+    def flatten(self, file_obj):
+        """Move a file back to the old flat encrypted/<name> layout"""
+        old_name = default_storage.save(f'encrypted/{file_obj.original_name}', file_obj.file)
+        default_storage.delete(file_obj.file.name)
+        File.objects.filter(pk=file_obj.pk).update(file=old_name)
+        return old_name
+
+    def relocate(self, *args):
+        out = io.StringIO()
+        call_command('relocate_files', *args, stdout=out)
+        return out.getvalue()
+
+    def test_paths_are_sharded_by_file_id(self):
+        file_obj = create_file(self.user, 'report.pdf')
+        self.assertEqual(file_obj.file.name, get_file_path(file_obj, 'report.pdf'))
+        prefix, first, second, name = file_obj.file.name.split('/')
+        self.assertEqual((prefix, len(first), len(second)), ('encrypted', 2, 2))
+        self.assertEqual(name, f'{file_obj.id.hex}.pdf')
+
+    def test_relocate_files(self):
+        moved = create_file(self.user, 'a.txt')
+        old_name = self.flatten(moved)
+        create_file(self.user, 'b.txt')  # already sharded
+
+        self.assertIn('Would move 1 files', self.relocate('--dry-run'))
+        self.assertTrue(default_storage.exists(old_name))
+
+        self.assertIn('Moved 1 files (1 already relocated, 0 missing)', self.relocate())
+        moved.refresh_from_db()
+        self.assertEqual(moved.file.name, get_file_path(moved, 'a.txt'))
+        self.assertFalse(default_storage.exists(old_name))
+        with moved.file.open('rb') as fh:
+            self.assertEqual(fh.read(), b'data')
+
+        self.assertIn('Moved 0 files (2 already relocated, 0 missing)', self.relocate())
+
+    def test_interrupted_relocation_is_not_collected(self):
+        file_obj = create_file(self.user, 'a.txt')
+        old_name = self.flatten(file_obj)
+        old_path = default_storage.path(old_name)
+        a_day_ago = time.time() - 24 * 60 * 60
+        os.utime(old_path, (a_day_ago, a_day_ago))
+
+        # Crash between the move and the row update
+        with mock.patch.object(QuerySet, 'update', side_effect=DatabaseError('connection lost')):
+            with self.assertRaises(DatabaseError):
+                self.relocate()
+        new_path = default_storage.path(get_file_path(file_obj, 'a.txt'))
+        self.assertTrue(os.path.exists(new_path))
+
+        collect_orphaned_blobs()
+        self.assertTrue(os.path.exists(new_path))
+
+        self.assertIn('Moved 1 files', self.relocate())
+        file_obj.refresh_from_db()
+        with file_obj.file.open('rb') as fh:
+            self.assertEqual(fh.read(), b'data')
+
+    def test_missing_blob_is_reported(self):
+        file_obj = create_file(self.user, 'gone.txt')
+        old_name = self.flatten(file_obj)
+        default_storage.delete(old_name)
+
+        self.assertIn('Missing blob', self.relocate())
+        file_obj.refresh_from_db()
+        self.assertEqual(file_obj.file.name, old_name)
@@ -0,0 +1,159 @@
+import io
+import os
+from unittest import mock
+
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.authentication.models import User
+from apps.files import uploads
+from apps.files.models import File, UploadSession
+from apps.files.tests import MediaTestCase
+from apps.files.views import FileViewSet
+
+
+class ChunkedUploadTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def initiate(self, size):
+        response = self.client.post('/api/files/uploads/', {
+            'original_name': 'data.txt',
+            'file_type': 'text/plain',
+            'size': size,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        return UploadSession.objects.get(pk=response.data['id'])
+
+    def put_part(self, session, number, data):
+        return self.client.put(
+            f'/api/files/uploads/{session.id}/parts/{number}/',
+            data, content_type='application/octet-stream'
+        )
+
+    def complete(self, session):
+        return self.client.post(f'/api/files/uploads/{session.id}/complete/')
+
+    def test_upload_in_parts(self):
+        session = self.initiate(10)
+        self.assertEqual(self.put_part(session, 1, b'hello').data, {'part_number': 1, 'size': 5})
+        self.put_part(session, 2, b'world')
+
+        response = self.complete(session)
+        self.assertEqual(response.status_code, 201)
+        file_obj = File.objects.get()
+        with file_obj.file.open('rb') as fh:
+            self.assertEqual(fh.read(), b'helloworld')
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(session.staging_dir))
+
+    def test_resume_after_missing_part(self):
+        session = self.initiate(10)
+        self.put_part(session, 2, b'world')
+
+        status = self.client.get(f'/api/files/uploads/{session.id}/').data
+        self.assertEqual(status['parts'], [{'part_number': 2, 'size': 5}])
+        self.assertEqual(status['status'], 'UPLOADING')
+
+        response = self.complete(session)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Missing parts: [1]')
+
+        self.put_part(session, 1, b'hello')
+        self.assertEqual(self.complete(session).status_code, 201)
+
+    def test_wrong_total_size_is_refused(self):
+        session = self.initiate(10)
+        self.put_part(session, 1, b'hell')
+
+        response = self.complete(session)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data['error'], 'Uploaded 4 bytes but the upload was initiated with 10'
+        )
+        session.refresh_from_db()
+        self.assertEqual(session.status, UploadSession.Status.UPLOADING)
+
+    def test_session_being_assembled_is_left_alone(self):
+        session = self.initiate(5)
+        self.put_part(session, 1, b'hello')
+        self.assertTrue(session.start_assembly())
+
+        self.assertEqual(self.complete(session).status_code, 409)
+        self.assertEqual(self.put_part(session, 1, b'HELLO').status_code, 409)
+        self.assertEqual(self.client.delete(f'/api/files/uploads/{session.id}/').status_code, 409)
+
+    def test_failed_completion_can_be_retried(self):
+        session = self.initiate(5)
+        self.put_part(session, 1, b'hello')
+
+        with mock.patch.object(FileViewSet, 'store_content', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.complete(session)
+
+        session.refresh_from_db()
+        self.assertEqual(session.status, UploadSession.Status.UPLOADING)
+        self.assertEqual(os.listdir(session.staging_dir), ['part_1'])
+        self.assertEqual(self.complete(session).status_code, 201)
+
+    def test_parts_cannot_exceed_the_initiated_size(self):
+        session = self.initiate(10)
+        self.put_part(session, 1, b'hello')
+
+        response = self.put_part(session, 2, b'world!')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], 'Part exceeds the upload size; 5 bytes remain')
+        self.assertEqual(os.listdir(session.staging_dir), ['part_1'])
+
+        # Re-sending a part replaces it, so its old size does not count
+        self.assertEqual(self.put_part(session, 1, b'helloworld').status_code, 200)
+
+    def test_expired_session_accepts_no_parts(self):
+        session = self.initiate(5)
+        UploadSession.objects.filter(pk=session.pk).update(expires_at=timezone.now())
+
+        self.assertEqual(self.put_part(session, 1, b'hello').status_code, 410)
+        self.assertFalse(os.path.exists(session.staging_dir))
+
+
+class OverlappingStream(io.BytesIO):
+    """A part body that lets another upload of the same part run mid-read"""
+
+    def __init__(self, data, during_read):
+        super().__init__(data)
+        self.during_read = during_read
+
+    def read(self, size=-1):
+        if self.during_read:
+            during_read, self.during_read = self.during_read, None
+            during_read()
+        return super().read(size)
+
+
+class WritePartTests(MediaTestCase):
+    def setUp(self):
+        user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.session = UploadSession.create_for_user(
+            user, original_name='data.txt', file_type='text/plain', size=5
+        )
+
+    def test_overlapping_writes_of_a_part_do_not_mix(self):
+        def retry():
+            uploads.write_part(self.session, 1, io.BytesIO(b'other'))
+
+        uploads.write_part(self.session, 1, OverlappingStream(b'first', retry))
+
+        # The last write to finish wins, whole; no temporary files are left
+        self.assertEqual(os.listdir(self.session.staging_dir), ['part_1'])
+        with open(uploads.part_path(self.session, 1), 'rb') as fh:
+            self.assertEqual(fh.read(), b'first')
+
+    def test_session_expiring_mid_part_discards_it(self):
+        def expire():
+            self.session.expires_at = timezone.now()
+
+        with self.assertRaises(uploads.UploadExpired):
+            uploads.write_part(self.session, 1, OverlappingStream(b'hello', expire))
+        self.assertEqual(os.listdir(self.session.staging_dir), [])
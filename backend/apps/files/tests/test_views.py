@@ -0,0 +1,510 @@
+import base64
+import io
+import os
+import zipfile
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.authentication.models import User
+from apps.files import access, quota, signed_links
+from apps.files.checks import check_access_cache
+from apps.files.models import File, FileShare, StorageUsage
+from apps.files.tests import MediaTestCase, create_file
+from apps.files.views import FileViewSet
+from core import views as core_views
+from core.middleware import MetricsMiddleware
+
+
+class FileListQueryCountTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_files(self, count, shared_by=None):
+        for i in range(count):
+            owner = shared_by or self.user
+            file_obj = create_file(owner, f'file_{i}.txt')
+            if shared_by:
+                FileShare.objects.create(
+                    file=file_obj,
+                    shared_by=shared_by,
+                    shared_with=self.user,
+                    permission=FileShare.Permissions.DOWNLOAD
+                )
+
+    def list_query_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/files/')
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_list_query_count_does_not_grow_with_shared_files(self):
+        sharer = User.objects.create_user(email='sharer@example.com', password='pass')
+        self.create_files(1)
+        self.create_files(1, shared_by=sharer)
+        baseline, _ = self.list_query_count()
+
+        self.create_files(5)
+        self.create_files(10, shared_by=sharer)
+        count, response = self.list_query_count()
+
+        self.assertEqual(count, baseline)
+        self.assertEqual(len(response.data), 17)
+
+    def test_list_includes_share_metadata(self):
+        sharer = User.objects.create_user(email='sharer@example.com', password='pass')
+        self.create_files(1, shared_by=sharer)
+        self.create_files(1)
+
+        _, response = self.list_query_count()
+        shared = [item for item in response.data if item['is_shared']]
+        owned = [item for item in response.data if not item['is_shared']]
+
+        self.assertEqual(len(shared), 1)
+        self.assertEqual(shared[0]['shared_by'], 'sharer@example.com')
+        self.assertEqual(shared[0]['permission'], 'DOWNLOAD')
+        self.assertIsNone(owned[0]['shared_by'])
+        self.assertIsNone(owned[0]['permission'])
+
+
+class FilePaginationTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.files = [
+            create_file(self.user, f'file_{i}.txt')
+            for i in range(5)
+        ]
+        # Three files share a timestamp, so the id has to break the tie
+        now = timezone.now()
+        for i, file_obj in enumerate(self.files):
+            file_obj.created_at = now - timedelta(minutes=min(i, 2))
+            File.objects.filter(pk=file_obj.pk).update(created_at=file_obj.created_at)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def expected_order(self):
+        return [
+            str(f.id) for f in sorted(self.files, key=lambda f: (f.created_at, f.id), reverse=True)
+        ]
+
+    def test_unpaginated_by_default(self):
+        response = self.client.get('/api/files/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 5)
+
+    def test_pages_follow_the_cursor(self):
+        ids = []
+        url = '/api/files/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        self.assertEqual(ids, self.expected_order())
+
+    @override_settings(FILE_LIST_MAX_PAGE_SIZE=3)
+    def test_page_size_is_capped(self):
+        response = self.client.get('/api/files/?page_size=100')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIn('page_size=3', response.data['next'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('not base64!', 'eHx5', base64.urlsafe_b64encode(b'yesterday|x').decode()):
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/files/', {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+    def test_sparse_fieldset(self):
+        response = self.client.get('/api/files/?fields=id,original_name')
+        self.assertEqual(set(response.data[0]), {'id', 'original_name'})
+
+
+class SignedLinkTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.file = create_file(self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def generate(self, **data):
+        response = self.client.post(
+            f'/api/files/{self.file.id}/generate_secure_link/',
+            {'mode': 'signed', **data},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.client.force_authenticate(None)
+        return response.data['secure_url']
+
+    def test_multi_use_link_does_not_touch_link_tables(self):
+        url = self.generate()
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), b'data')
+            self.assertEqual(len(queries), 1)  # the File row only
+
+    def test_single_use_link(self):
+        url = self.generate(single_use=True, permission='DOWNLOAD')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Disposition'].startswith('attachment'))
+        self.assertEqual(self.client.get(url).status_code, 410)
+
+    def test_single_use_from_form_data(self):
+        for value, single_use in (('false', False), ('true', True)):
+            with self.subTest(value=value):
+                self.client.force_authenticate(self.user)
+                response = self.client.post(
+                    f'/api/files/{self.file.id}/generate_secure_link/',
+                    {'mode': 'signed', 'single_use': value}
+                )
+                token = response.data['secure_url'].rstrip('/').rsplit('/', 1)[1]
+                self.assertEqual(signed_links.load_token(token).single_use, single_use)
+
+    def test_invalid_permission(self):
+        response = self.client.post(
+            f'/api/files/{self.file.id}/generate_secure_link/',
+            {'mode': 'signed', 'permission': 'OWNER'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('permission', response.data)
+
+    def test_tampered_link(self):
+        url = self.generate()
+        self.assertEqual(self.client.get(url.replace('/signed-link/', '/signed-link/x')).status_code, 404)
+
+
+class ShareExpiryTests(MediaTestCase):
+    def setUp(self):
+        owner = User.objects.create_user(email='owner@example.com', password='pass')
+        self.user = User.objects.create_user(email='recipient@example.com', password='pass')
+        self.file = create_file(owner)
+        self.share = FileShare.objects.create(
+            file=self.file,
+            shared_by=owner,
+            shared_with=self.user,
+            permission=FileShare.Permissions.DOWNLOAD,
+            expires_at=timezone.now() + timedelta(seconds=30)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_access_is_cached_no_longer_than_the_share(self):
+        role, timeout = access.load_access(self.user, self.file.id)
+        self.assertEqual(role, FileShare.Permissions.DOWNLOAD)
+        self.assertTrue(0 < timeout < 30)
+
+    def test_expired_share_grants_no_access(self):
+        FileShare.objects.filter(pk=self.share.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        access.invalidate(self.file.id, self.user.id)
+
+        self.assertEqual(self.client.get('/api/files/').data, [])
+        response = self.client.get(f'/api/files/{self.file.id}/download/')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(FILE_ACCESS_CACHE='default')
+class AccessCacheTests(MediaTestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(email='owner@example.com', password='pass')
+        self.user = User.objects.create_user(email='recipient@example.com', password='pass')
+        self.file = create_file(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.share = FileShare.objects.create(
+                file=self.file,
+                shared_by=self.owner,
+                shared_with=self.user,
+                permission=FileShare.Permissions.DOWNLOAD
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self):
+        return self.client.get(f'/api/files/{self.file.id}/download/')
+
+    def test_revoked_share_is_denied(self):
+        self.assertEqual(self.download().status_code, 200)
+        self.assertEqual(access.get_cache().get(access.cache_key(self.file.id, self.user.id)), 'DOWNLOAD')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.share.delete()
+        self.assertEqual(self.download().status_code, 404)
+
+    def test_downgraded_share_is_reloaded(self):
+        self.assertEqual(access.get_access(self.user, self.file.id), 'DOWNLOAD')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.share.permission = FileShare.Permissions.VIEW
+            self.share.save()
+        self.assertEqual(access.get_access(self.user, self.file.id), 'VIEW')
+
+    def test_invalidation_waits_for_commit(self):
+        key = access.cache_key(self.file.id, self.user.id)
+        access.get_access(self.user, self.file.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.share.delete()
+            self.assertEqual(access.get_cache().get(key), 'DOWNLOAD')
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(access.get_cache().get(key))
+
+    def test_process_local_cache_is_rejected(self):
+        self.assertEqual([error.id for error in check_access_cache(None)], ['files.E002'])
+        with override_settings(FILE_ACCESS_CACHE=None):
+            self.assertEqual(check_access_cache(None), [])
+
+
+class BulkShareTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.recipients = [
+            User.objects.create_user(email=f'user{i}@example.com', password='pass')
+            for i in range(3)
+        ]
+        self.files = [
+            create_file(self.user, f'file_{i}.txt')
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk_share(self, **data):
+        return self.client.post('/api/files/bulk-share/', data, format='json')
+
+    def test_bulk_share_upserts_in_constant_queries(self):
+        FileShare.objects.create(
+            file=self.files[0],
+            shared_by=self.user,
+            shared_with=self.recipients[0],
+            permission=FileShare.Permissions.VIEW
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk_share(
+                files=[str(f.id) for f in self.files],
+                emails=[u.email for u in self.recipients],
+                permission='DOWNLOAD'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 5)  # files, users, savepoint, upsert, release
+        self.assertEqual(
+            [item['status'] for item in response.data['results']], ['shared'] * 9
+        )
+        self.assertEqual(
+            FileShare.objects.filter(permission=FileShare.Permissions.DOWNLOAD).count(), 9
+        )
+
+    def test_bulk_share_reports_per_item_errors(self):
+        other = User.objects.create_user(email='other@example.com', password='pass')
+        foreign = create_file(other, 'foreign.txt')
+        response = self.bulk_share(
+            files=[str(self.files[0].id), str(foreign.id)],
+            emails=['user0@example.com', 'missing@example.com', 'owner@example.com']
+        )
+
+        errors = [item.get('error') for item in response.data['results']]
+        self.assertEqual(errors, [
+            None,
+            'User with this email does not exist',
+            'You cannot share a file with yourself',
+        ] + ["You don't have permission to share this file"] * 3)
+        self.assertEqual(FileShare.objects.count(), 1)
+
+    @override_settings(FILE_ACCESS_CACHE='default')
+    def test_bulk_share_invalidates_cached_access(self):
+        recipient = self.recipients[0]
+        self.assertIsNone(access.get_access(recipient, self.files[0].id))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bulk_share(files=[str(self.files[0].id)], emails=[recipient.email])
+        self.assertEqual(access.get_access(recipient, self.files[0].id), 'VIEW')
+
+
+class BulkFileTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.files = [
+            create_file(self.user, 'same.txt', data=f'data {i}'.encode())
+            for i in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_download_streams_a_zip(self):
+        response = self.client.post(
+            '/api/files/bulk-download/',
+            {'files': [str(f.id) for f in self.files]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        body = io.BytesIO(b''.join(response.streaming_content))
+        with zipfile.ZipFile(body) as archive:
+            self.assertEqual(
+                archive.namelist(), ['same.txt', 'same (1).txt', 'same (2).txt']
+            )
+            self.assertEqual(archive.read('same (2).txt'), b'data 2')
+
+    def test_bulk_download_requires_access_to_every_file(self):
+        other = User.objects.create_user(email='other@example.com', password='pass')
+        self.client.force_authenticate(other)
+        response = self.client.post(
+            '/api/files/bulk-download/', {'files': [str(self.files[0].id)]}, format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_bulk_delete_removes_rows_and_bytes(self):
+        paths = [f.file.path for f in self.files]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/files/bulk-delete/',
+                {'files': [str(self.files[0].id), str(self.files[1].id)]},
+                format='json'
+            )
+        self.assertEqual(len(response.data['deleted']), 2)
+        self.assertEqual(list(File.objects.all()), [self.files[2]])
+        self.assertEqual([os.path.exists(p) for p in paths], [False, False, True])
+
+    def test_share_recipient_cannot_delete_or_modify(self):
+        other = User.objects.create_user(email='other@example.com', password='pass')
+        FileShare.objects.create(
+            file=self.files[0],
+            shared_by=self.user,
+            shared_with=other,
+            permission=FileShare.Permissions.DOWNLOAD
+        )
+        self.client.force_authenticate(other)
+        url = f'/api/files/{self.files[0].id}/'
+
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(
+            self.client.patch(url, {'original_name': 'renamed.txt'}, format='json').status_code,
+            404
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(url).status_code, 404)
+
+        self.files[0].refresh_from_db()
+        self.assertEqual(self.files[0].original_name, 'same.txt')
+        self.assertTrue(os.path.exists(self.files[0].file.path))
+
+    def test_owner_deletes_row_and_bytes(self):
+        path = self.files[0].file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/files/{self.files[0].id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(File.objects.filter(pk=self.files[0].pk).exists())
+        self.assertFalse(os.path.exists(path))
+
+
+@override_settings(FILE_STORAGE_QUOTA=1024)
+class StorageQuotaTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, size):
+        upload = SimpleUploadedFile('file.txt', b'x' * size, content_type='text/plain')
+        return self.client.post('/api/files/', {'file': upload}, format='multipart')
+
+    def test_usage_follows_uploads_and_deletes(self):
+        self.assertEqual(self.upload(100).status_code, 201)
+        self.assertEqual(quota.get_usage(self.user.pk), (100, 1024))
+
+        File.objects.get().delete()
+        self.assertEqual(quota.get_usage(self.user.pk), (0, 1024))
+
+    def test_upload_over_quota_is_refused(self):
+        response = self.upload(2048)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(File.objects.exists())
+
+    def test_upload_without_content_length_is_checked(self):
+        # As for a chunked request, whose size is only known once parsed
+        with mock.patch.object(FileViewSet, 'declared_size', return_value=0):
+            response = self.upload(2048)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(File.objects.exists())
+
+    def test_reconcile(self):
+        self.upload(100)
+        StorageUsage.objects.update(bytes_used=0, file_count=0)
+        quota.reconcile([self.user.pk])
+        usage = StorageUsage.objects.get(user=self.user)
+        self.assertEqual((usage.bytes_used, usage.file_count), (100, 1))
+
+
+@override_settings(METRICS_AUTH_TOKEN='scrape-token')
+class RequestMetricsTests(MediaTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='owner@example.com', password='pass')
+        self.file = create_file(self.user, 'a.txt', data=b'x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def scrape(self):
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_metrics_are_recorded_per_view(self):
+        self.assertEqual(self.client.get('/api/files/').status_code, 200)
+
+        body = self.scrape()
+        self.assertIn('http_request_duration_seconds_count{view="FileViewSet.list",method="GET",status="200"}', body)
+        self.assertIn('http_request_db_queries_count{view="FileViewSet.list"}', body)
+        self.assertIn('http_request_serializer_duration_seconds_count{view="FileViewSet.list"}', body)
+        self.assertIn('http_response_bytes_count{view="FileViewSet.list"}', body)
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    def test_server_timing_header(self):
+        response = self.client.get('/api/files/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="[1-9]\d* queries", serializer;dur=[\d.]+$')
+
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.scrape()
+
+    def test_metrics_endpoint_follows_the_setting_and_is_not_measured(self):
+        self.assertIs(resolve(settings.METRICS_PATH).func, core_views.metrics)
+        self.scrape()
+        self.assertNotIn('core.views.metrics', self.scrape())
+
+    @override_settings(METRICS_AUTH_TOKEN=None, DEBUG=False)
+    def test_metrics_are_refused_without_a_token_in_production(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_middleware_is_async_capable(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = MetricsMiddleware(get_response)
+        self.assertTrue(iscoroutinefunction(middleware))
+
+    @override_settings(METRICS_SERVER_TIMING=True)
+    async def test_async_view_queries_are_counted(self):
+        access_token = RefreshToken.for_user(self.user).access_token
+        response = await AsyncClient().get(
+            f'/api/async/files/{self.file.id}/download/',
+            headers={'Authorization': f'Bearer {access_token}'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries"')
@@ -0,0 +1,168 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files import File as DjangoFile
+
+STREAM_CHUNK_SIZE = 64 * 1024
+PART_FILE_RE = re.compile(r'^part_(\d+)$')
+
+
+class UploadError(Exception):
+    pass
+
+
+class UploadExpired(UploadError):
+    pass
+
+
+class StagedFile(DjangoFile):
+    """
+    A file already on disk next to MEDIA_ROOT. Exposing temporary_file_path()
+    lets FileSystemStorage move it into place instead of copying it.
+    """
+    def __init__(self, path, name):
+        super().__init__(open(path, 'rb'), name=name)
+        self._path = path
+
+    def temporary_file_path(self):
+        return self._path
+
+    def discard(self):
+        """Remove the staged file if storage has not moved it into place"""
+        self.close()
+        remove_file(self._path)
+
+
+def part_path(session, part_number):
+    return os.path.join(session.staging_dir, f'part_{part_number}')
+
+
+def write_part(session, part_number, stream):
+    """
+    Stream a request body into the staging area for one part.
+    The part only becomes visible once it has been written completely.
+    Parts together may not exceed the size the session was initiated
+    with, which is what the quota and MAX_CHUNKED_UPLOAD_SIZE were
+    checked against.
+    """
+    if not 1 <= part_number <= settings.UPLOAD_MAX_PARTS:
+        raise UploadError(f"Part number must be between 1 and {settings.UPLOAD_MAX_PARTS}")
+    if stream is None:
+        raise UploadError("Part body is empty")
+    if session.is_expired:
+        raise UploadExpired("Upload has expired")
+
+    os.makedirs(session.staging_dir, exist_ok=True)
+    final_path = part_path(session, part_number)
+    limit = min(settings.UPLOAD_PART_MAX_SIZE, remaining_size(session, part_number))
+    # A unique name per request: retries of the same part may overlap, and
+    # each must write and publish (or discard) only its own copy
+    fd, tmp_path = tempfile.mkstemp(prefix=f'part_{part_number}.', dir=session.staging_dir)
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > limit:
+                    raise part_too_large(limit)
+                out.write(chunk)
+        if written == 0:
+            raise UploadError("Part body is empty")
+        # Other parts may have landed while this one was streaming
+        if written > remaining_size(session, part_number):
+            raise part_too_large(remaining_size(session, part_number))
+        if session.is_expired:
+            raise UploadExpired("Upload has expired")
+        os.replace(tmp_path, final_path)
+    except BaseException:
+        remove_file(tmp_path)
+        raise
+    return written
+
+
+def remaining_size(session, part_number):
+    """Bytes the part may hold; a re-sent part replaces its earlier copy"""
+    staged = sum(
+        part['size'] for part in list_parts(session)
+        if part['part_number'] != part_number
+    )
+    return max(session.size - staged, 0)
+
+
+def part_too_large(limit):
+    if limit == settings.UPLOAD_PART_MAX_SIZE:
+        return UploadError(
+            f"Part size cannot exceed {settings.UPLOAD_PART_MAX_SIZE/1024/1024}MB")
+    return UploadError(f"Part exceeds the upload size; {limit} bytes remain")
+
+
+def list_parts(session):
+    """Return the parts received so far, ordered by part number"""
+    try:
+        entries = os.scandir(session.staging_dir)
+    except FileNotFoundError:
+        return []
+    parts = []
+    with entries:
+        for entry in entries:
+            match = PART_FILE_RE.match(entry.name)
+            if match:
+                parts.append({
+                    'part_number': int(match.group(1)),
+                    'size': entry.stat().st_size,
+                })
+    return sorted(parts, key=lambda part: part['part_number'])
+
+
+def assemble(session):
+    """
+    Concatenate the staged parts into a single file inside the staging
+    directory and return its path and SHA-256. Parts are copied through a
+    fixed-size buffer, so memory use does not depend on the upload size,
+    and the digest is computed on the way through.
+    """
+    parts = list_parts(session)
+    if not parts:
+        raise UploadError("No parts have been uploaded")
+
+    numbers = [part['part_number'] for part in parts]
+    if numbers != list(range(1, len(parts) + 1)):
+        missing = sorted(set(range(1, numbers[-1] + 1)) - set(numbers))
+        raise UploadError(f"Missing parts: {missing}")
+
+    total = sum(part['size'] for part in parts)
+    if total != session.size:
+        raise UploadError(
+            f"Uploaded {total} bytes but the upload was initiated with {session.size}")
+
+    fd, assembled_path = tempfile.mkstemp(prefix='assembled.', dir=session.staging_dir)
+    digest = hashlib.sha256()
+    with os.fdopen(fd, 'wb') as out:
+        for number in numbers:
+            with open(part_path(session, number), 'rb') as src:
+                while True:
+                    chunk = src.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+    return assembled_path, digest.hexdigest()
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def discard(session):
+    """Remove everything staged for a session"""
+    shutil.rmtree(session.staging_dir, ignore_errors=True)
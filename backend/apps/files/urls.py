@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import FileViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register('files', FileViewSet, basename='file')
@@ -9,4 +10,16 @@ app_name = 'files'
 
 urlpatterns = [
     path('', include(router.urls)),
+    # Async (ASGI) download paths
+    path('async/files/<uuid:pk>/download/', async_views.download, name='async-download'),
+    path(
+        'async/files/secure-link/<uuid:link_id>/',
+        async_views.access_secure_link,
+        name='async-access-secure-link'
+    ),
+    path(
+        'async/files/signed-link/<str:token>/',
+        async_views.access_signed_link,
+        name='async-access-signed-link'
+    ),
 ]
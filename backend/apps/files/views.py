@@ -4,49 +4,138 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
+from django.http import Http404, StreamingHttpResponse
 from django.conf import settings
-from .models import File, FileShare, SecureLink
-from .serializers import FileSerializer, FileShareSerializer, SecureLinkSerializer
+from .models import ConsumedLink, File, FileShare, SecureLink, UploadSession
+from .serializers import (
+    BulkFileSerializer, BulkShareSerializer, FileSerializer, FileShareSerializer,
+    SecureLinkSerializer, SignedLinkSerializer, UploadSessionSerializer
+)
+from . import access, archive, blobs, encryption, quota, signed_links, uploads
+from .delivery import get_delivery_backend, set_attachment_headers, set_inline_headers
+from .pagination import FileCursorPagination
 from apps.authentication.permissions import IsAdmin
-from django.db import models 
+from django.db import models, transaction
 from rest_framework import serializers 
-from django.http import FileResponse 
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from rest_framework_simplejwt.authentication import JWTAuthentication
+from apps.authentication.authentication import CachedJWTAuthentication
+from django.contrib.auth import get_user_model
+from utils.log import log_event
+import logging
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
 
 class FileViewSet(viewsets.ModelViewSet):
     serializer_class = FileSerializer
     permission_classes = [permissions.IsAuthenticated]
-    authentication_classes = [JWTAuthentication]
+    authentication_classes = [CachedJWTAuthentication]
     parser_classes = [MultiPartParser, FormParser, JSONParser]
     queryset = File.objects.all()
+    pagination_class = FileCursorPagination
 
     def get_permissions(self):
         """
         Override to allow unauthenticated access to secure links
         """
-        if self.action == 'access_secure_link':
+        if self.action in ('access_secure_link', 'access_signed_link'):
             return [permissions.AllowAny()]
         return [permission() for permission in self.permission_classes]
 
+    def get_requested_fields(self):
+        """
+        Sparse fieldset from ?fields=a,b,c on list and retrieve
+        """
+        if self.action not in ('list', 'retrieve'):
+            return None
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return None
+        return [field.strip() for field in fields.split(',') if field.strip()]
+
+    def get_serializer(self, *args, **kwargs):
+        if self.get_serializer_class() is FileSerializer:
+            fields = self.get_requested_fields()
+            if fields is not None:
+                kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
     def get_queryset(self):
         """
         Extend queryset to include shared files
         """
         user = self.request.user
+        # A share grants read access only; changing or deleting a file (and
+        # with it the bytes, see signals.delete_file_content) is for its owner
+        if self.action in ('update', 'partial_update', 'destroy'):
+            return File.objects.filter(owner=user)
+
+        # The requesting user's share of each file is fetched in the same
+        # query so FileSerializer does not hit the database per row
+        user_share = FileShare.objects.active().filter(
+            file=models.OuterRef('pk'),
+            shared_with=user
+        )
         # Get files owned by user and shared with user
-        return File.objects.filter(
-            models.Q(owner=user) | 
-            models.Q(shares__shared_with=user)
-        ).distinct()
+        queryset = File.objects.accessible_to(user)
+
+        fields = self.get_requested_fields()
+        if fields is not None and not {'shared_by', 'permission'} & set(fields):
+            return queryset
+        return queryset.annotate(
+            share_permission=models.Subquery(user_share.values('permission')[:1]),
+            share_shared_by=models.Subquery(user_share.values('shared_by__email')[:1]),
+        )
+
+    def store_content(self, file_instance, content):
+        """
+        Save a new File together with its bytes: encrypted at rest,
+        deduplicated, or stored as uploaded, depending on settings
+        """
+        if settings.FILE_ENCRYPTION_AT_REST:
+            content.seek(0)
+            staged = encryption.encrypt_for_storage(content, file_instance)
+            try:
+                with staged:
+                    file_instance.file = staged
+                    file_instance.save()
+            except BaseException:
+                staged.discard()
+                raise
+            return
+        if settings.FILE_STORAGE_DEDUP:
+            blobs.attach_blob(file_instance, content)
+        file_instance.save()
+
+    def quota_exceeded(self):
+        return Response(
+            {'error': 'Storage quota exceeded'},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+
+    def declared_size(self, request):
+        """The request's Content-Length, or 0 if it is missing or invalid"""
+        try:
+            return int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return 0
 
     def create(self, request, *args, **kwargs):
+        # Checked against the request size before the body is parsed, so an
+        # over-quota upload is usually refused before any of it is written to
+        # disk. This is only a shortcut: the header may be missing or wrong,
+        # so the parsed file is checked again below.
+        if not quota.has_room(request.user.pk, self.declared_size(request)):
+            return self.quota_exceeded()
+
         file_obj = request.FILES.get('file')
         if not file_obj:
             return Response(
                 {'error': 'No file provided'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if not quota.has_room(request.user.pk, file_obj.size):
+            return self.quota_exceeded()
 
         # Create file instance
         file_instance = File(
@@ -54,12 +143,14 @@ class FileViewSet(viewsets.ModelViewSet):
             original_name=file_obj.name,
             file=file_obj,
             file_type=file_obj.content_type,
-            size=file_obj.size
+            size=file_obj.size,
+            content_hash=blobs.hash_upload(file_obj)
         )
         
         try:
             file_instance.full_clean()  # Validate model
-            file_instance.save()
+            with transaction.atomic():
+                self.store_content(file_instance, file_obj)
             
             serializer = self.get_serializer(file_instance)
             return Response(
@@ -75,41 +166,87 @@ class FileViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['get'])
     def download(self, request, pk=None):
-        file_obj = self.get_object()
-        
-        # Check if user has permission to access the file
-        if file_obj.owner != request.user:
-            try:
-                share = FileShare.objects.get(
-                    file=file_obj, 
-                    shared_with=request.user
-                )
-                # Allow both VIEW and DOWNLOAD permissions to access the file content
-                # VIEW permission is needed for previewing files
-                if share.permission not in ['VIEW', 'DOWNLOAD']:
-                    return Response(
-                        {'error': 'Access not permitted'}, 
-                        status=status.HTTP_403_FORBIDDEN
-                    )
-            except FileShare.DoesNotExist:
-                return Response(
-                    {'error': 'Access not permitted'}, 
-                    status=status.HTTP_403_FORBIDDEN
-                )
+        # The access decision is cached, so a hit costs only the File
+        # lookup below
+        role = access.get_access(request.user, pk, request)
+        if role is None:
+            raise Http404
+        # Allow both VIEW and DOWNLOAD permissions to access the file content
+        # VIEW permission is needed for previewing files
+        if role not in access.DOWNLOADABLE:
+            return Response(
+                {'error': 'Access not permitted'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        file_obj = get_object_or_404(File, pk=pk)
 
-        response = FileResponse(
-            file_obj.file,
+        response = get_delivery_backend().serve(
+            request,
+            file_obj,
             content_type='application/octet-stream'
         )
-        response['Content-Disposition'] = f'attachment; filename="{file_obj.original_name}"'
+        return set_attachment_headers(response, file_obj)
+
+    @action(detail=False, methods=['post'], url_path='bulk-delete')
+    def bulk_delete(self, request):
+        """
+        Delete many of the user's own files in one transaction. Rows are
+        deleted in batches; blob references are released and stored
+        bytes removed by the post_delete handlers once it commits.
+        """
+        serializer = BulkFileSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file_ids = serializer.validated_data['files']
+
+        owned = list(
+            File.objects.filter(pk__in=file_ids, owner=request.user)
+            .values_list('pk', flat=True)
+        )
+        batch_size = settings.FILE_BULK_DELETE_BATCH_SIZE
+        with transaction.atomic():
+            for start in range(0, len(owned), batch_size):
+                File.objects.filter(pk__in=owned[start:start + batch_size]).delete()
+
+        deleted = set(owned)
+        return Response({
+            'deleted': owned,
+            'not_found': [file_id for file_id in file_ids if file_id not in deleted],
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-download')
+    def bulk_download(self, request):
+        """
+        Stream a ZIP archive of several files. Access to all of them is
+        checked with a single query; the archive is built while it is sent.
+        """
+        serializer = BulkFileSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        file_ids = serializer.validated_data['files']
+
+        files = {
+            file_obj.pk: file_obj
+            for file_obj in File.objects.accessible_to(request.user).filter(pk__in=file_ids)
+        }
+        missing = [file_id for file_id in file_ids if file_id not in files]
+        if missing:
+            return Response(
+                {'error': 'Files not found', 'not_found': missing},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        response = StreamingHttpResponse(
+            archive.iter_zip([files[file_id] for file_id in file_ids]),
+            content_type='application/zip'
+        )
+        response['Content-Disposition'] = 'attachment; filename="files.zip"'
         return response
 
     @action(detail=True, methods=['post'])
     def share(self, request, pk=None):
         file = self.get_object()
         
-        # Debug logging
-        print("Request data:", request.data)
+        log_event(logger, 'files.share', 'share requested', file=str(file.pk),
+                  permission=request.data.get('permission'))
         
         # Check if user is the file owner
         if file.owner != request.user:
@@ -128,13 +265,69 @@ class FileViewSet(viewsets.ModelViewSet):
         )
         
         if not serializer.is_valid():
-            # Debug logging
-            print("Serializer errors:", serializer.errors)
+            log_event(logger, 'files.share', 'share rejected', file=str(file.pk),
+                      errors=serializer.errors)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             
         serializer.save(file=file)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=['post'], url_path='bulk-share')
+    def bulk_share(self, request):
+        """
+        Share many files with many users. Recipients are resolved in one
+        query and all shares are upserted in one statement; the response
+        has a result per (file, email) pair.
+        """
+        serializer = BulkShareSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        owned = set(
+            File.objects.filter(pk__in=data['files'], owner=request.user)
+            .values_list('pk', flat=True)
+        )
+        recipients = dict(
+            User.objects.filter(email__in=data['emails']).values_list('email', 'pk')
+        )
+
+        results = []
+        shares = []
+        for file_id in data['files']:
+            for email in data['emails']:
+                result = {'file': file_id, 'email': email}
+                if file_id not in owned:
+                    result['error'] = "You don't have permission to share this file"
+                elif email not in recipients:
+                    result['error'] = "User with this email does not exist"
+                elif recipients[email] == request.user.pk:
+                    result['error'] = "You cannot share a file with yourself"
+                else:
+                    shares.append(FileShare(
+                        file_id=file_id,
+                        shared_by=request.user,
+                        shared_with_id=recipients[email],
+                        permission=data['permission'],
+                        expires_at=data['expires_at']
+                    ))
+                result['status'] = 'error' if 'error' in result else 'shared'
+                results.append(result)
+
+        if shares:
+            with transaction.atomic():
+                FileShare.objects.bulk_create(
+                    shares,
+                    update_conflicts=True,
+                    unique_fields=['file', 'shared_with'],
+                    update_fields=['shared_by', 'permission', 'expires_at']
+                )
+            # bulk_create sends no signals, so drop the cached decisions here
+            access.invalidate_many(
+                (share.file_id, share.shared_with_id) for share in shares
+            )
+
+        return Response({'results': results})
+
     @action(detail=True, methods=['get'])
     def shared_users(self, request, pk=None):
         file = self.get_object()
@@ -159,6 +352,9 @@ class FileViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
+        if request.data.get('mode') == 'signed':
+            return self.generate_signed_link(request, file)
+
         # Create secure link
         secure_link = SecureLink.create_for_file(
             file=file,
@@ -175,35 +371,211 @@ class FileViewSet(viewsets.ModelViewSet):
             'expires_at': secure_link.expires_at
         })
 
+    def generate_signed_link(self, request, file):
+        serializer = SignedLinkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        token, expires_at = signed_links.make_token(
+            file,
+            permission=serializer.validated_data['permission'],
+            single_use=serializer.validated_data['single_use'],
+            expires_in_minutes=60  # 1 hour expiry
+        )
+
+        secure_url = request.build_absolute_uri(
+            f'/api/files/signed-link/{token}/'
+        )
+
+        return Response({
+            'secure_url': secure_url,
+            'expires_at': expires_at
+        })
+
     @action(detail=False, methods=['get'], url_path='secure-link/(?P<link_id>[^/.]+)')
     def access_secure_link(self, request, link_id=None):
-        secure_link = get_object_or_404(SecureLink, id=link_id)
-        
+        # A HEAD carries no body, so it only checks the link. A GET uses it
+        # up and always gets the whole file: Range and If-None-Match are
+        # ignored, or a probe would spend the link on a 206 or 304.
+        secure_link, consumed = SecureLink.consume(link_id, peek=request.method == 'HEAD')
+        if secure_link is None:
+            raise Http404
+
         # Check if link is expired or used
-        if secure_link.is_expired:
+        if not consumed:
+            if secure_link.is_expired:
+                return Response(
+                    {"error": "Link has expired"},
+                    status=status.HTTP_410_GONE
+                )
             return Response(
-                {"error": "Link has expired"},
+                {"error": "Link has already been used"},
                 status=status.HTTP_410_GONE
             )
         
-        if secure_link.is_used:
+        # Return the file
+        response = get_delivery_backend().serve(
+            request,
+            secure_link.file,
+            content_type=secure_link.file.file_type,
+            partial=False
+        )
+        return set_inline_headers(response, secure_link.file)
+
+    def get_upload_session(self, upload_id):
+        return get_object_or_404(UploadSession, id=upload_id, owner=self.request.user)
+
+    @action(detail=False, methods=['get'], url_path='signed-link/(?P<token>[^/]+)')
+    def access_signed_link(self, request, token=None):
+        try:
+            link = signed_links.load_token(token)
+        except signed_links.ExpiredSignedLink:
+            return Response(
+                {"error": "Link has expired"},
+                status=status.HTTP_410_GONE
+            )
+        except signed_links.InvalidSignedLink:
+            raise Http404
+
+        # Single-use links are spent like secure links, see access_secure_link
+        if link.single_use and not ConsumedLink.consume(
+            link.nonce, link.expires_at, peek=request.method == 'HEAD'
+        ):
             return Response(
                 {"error": "Link has already been used"},
                 status=status.HTTP_410_GONE
             )
-        
-        # Mark link as used
-        secure_link.is_used = True
-        secure_link.save()
-        
-        # Return the file
-        response = FileResponse(
-            secure_link.file.file,
-            content_type=secure_link.file.file_type
-        )
-        response['X-File-Name'] = secure_link.file.original_name
-        response['X-File-Type'] = secure_link.file.file_type
-        response['Content-Type'] = secure_link.file.file_type
-        response['Content-Disposition'] = f'inline; filename="{secure_link.file.original_name}"'
-        response['Access-Control-Expose-Headers'] = 'X-File-Name, X-File-Type, Content-Type, Content-Disposition'
-        return response
+
+        file_obj = get_object_or_404(File, pk=link.file_id)
+        response = get_delivery_backend().serve(
+            request,
+            file_obj,
+            content_type=file_obj.file_type,
+            partial=not link.single_use
+        )
+        if link.permission == FileShare.Permissions.DOWNLOAD:
+            return set_attachment_headers(response, file_obj)
+        return set_inline_headers(response, file_obj)
+
+    @action(detail=False, methods=['post'], url_path='uploads')
+    def initiate_upload(self, request):
+        """
+        Start a resumable upload. Parts are then PUT to
+        uploads/<id>/parts/<n>/ and joined with uploads/<id>/complete/.
+        """
+        serializer = UploadSessionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if not quota.has_room(request.user.pk, serializer.validated_data['size']):
+            return self.quota_exceeded()
+
+        session = UploadSession.create_for_user(request.user, **serializer.validated_data)
+        return Response(
+            UploadSessionSerializer(session).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    @action(detail=False, methods=['get', 'delete'], url_path='uploads/(?P<upload_id>[^/.]+)')
+    def upload_status(self, request, upload_id=None):
+        """
+        Report which parts have been received, so an interrupted client
+        knows where to resume. DELETE aborts the upload.
+        """
+        session = self.get_upload_session(upload_id)
+
+        if request.method == 'DELETE':
+            if session.status == UploadSession.Status.ASSEMBLING:
+                return self.upload_in_progress()
+            uploads.discard(session)
+            session.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        return Response(UploadSessionSerializer(session).data)
+
+    @action(
+        detail=False,
+        methods=['put'],
+        url_path='uploads/(?P<upload_id>[^/.]+)/parts/(?P<part_number>[0-9]+)'
+    )
+    def upload_part(self, request, upload_id=None, part_number=None):
+        session = self.get_upload_session(upload_id)
+        if session.is_expired:
+            return Response(
+                {"error": "Upload has expired"},
+                status=status.HTTP_410_GONE
+            )
+        if session.status == UploadSession.Status.ASSEMBLING:
+            return self.upload_in_progress()
+
+        # Read the raw body straight from the request stream; request.data
+        # is never touched, so the part is not buffered by a parser.
+        try:
+            size = uploads.write_part(session, int(part_number), request.stream)
+        except uploads.UploadExpired as e:
+            return Response({'error': str(e)}, status=status.HTTP_410_GONE)
+        except uploads.UploadError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({'part_number': int(part_number), 'size': size})
+
+    def upload_in_progress(self):
+        return Response(
+            {"error": "Upload is being completed"},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    @action(detail=False, methods=['post'], url_path='uploads/(?P<upload_id>[^/.]+)/complete')
+    def complete_upload(self, request, upload_id=None):
+        session = self.get_upload_session(upload_id)
+        if session.is_expired:
+            return Response(
+                {"error": "Upload has expired"},
+                status=status.HTTP_410_GONE
+            )
+        # Other uploads may have used up the space since initiate_upload
+        if not quota.has_room(request.user.pk, session.size):
+            return self.quota_exceeded()
+
+        # Joining a multi-GB upload takes a while: claim the session with a
+        # short conditional UPDATE instead of holding a row lock meanwhile
+        if not session.start_assembly():
+            return self.upload_in_progress()
+        assembled_path = None
+        try:
+            assembled_path, content_hash = uploads.assemble(session)
+
+            # The assembled file lives under MEDIA_ROOT, so storage moves it
+            # into place rather than copying it
+            with transaction.atomic():
+                with uploads.StagedFile(assembled_path, session.original_name) as staged:
+                    file_instance = File(
+                        owner=request.user,
+                        original_name=session.original_name,
+                        file=staged,
+                        file_type=session.file_type,
+                        size=session.size,
+                        content_hash=content_hash
+                    )
+                    self.store_content(file_instance, staged)
+                UploadSession.objects.filter(pk=session.pk).delete()
+        except uploads.UploadError as e:
+            session.cancel_assembly()
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except BaseException:
+            # The parts are kept so the client can retry the completion
+            if assembled_path:
+                uploads.remove_file(assembled_path)
+            session.cancel_assembly()
+            raise
+
+        uploads.discard(session)
+        serializer = self.get_serializer(file_instance)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
@@ -0,0 +1,193 @@
+"""
+Per-view performance metrics.
+
+MetricsMiddleware measures every request and files the numbers under the
+view that handled it, e.g. ``FileViewSet.list`` or ``FileViewSet.download``:
+
+- wall time from the middleware to the returned response
+- number and total time of database queries, through an execute wrapper
+  installed on every connection; it finds the request's QueryTimer in a
+  contextvar, so queries run by async views through sync_to_async count
+- time spent in TimedSerializerMixin serializers
+- bytes in the response body; for streamed bodies without a
+  Content-Length they are counted as the body is sent
+
+The middleware runs natively under both WSGI and ASGI, so async views are
+not pushed through a thread. The histograms are served in the Prometheus
+format by core.views.metrics. With METRICS_SERVER_TIMING the same numbers
+are returned to the client in a Server-Timing header.
+"""
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from utils import metrics
+
+REQUEST_DURATION = metrics.REGISTRY.register(metrics.Histogram(
+    'http_request_duration_seconds', 'Wall time of requests by view',
+    labelnames=('view', 'method', 'status')
+))
+DB_QUERIES = metrics.REGISTRY.register(metrics.Histogram(
+    'http_request_db_queries', 'Database queries per request by view',
+    labelnames=('view',), buckets=metrics.COUNT_BUCKETS
+))
+DB_DURATION = metrics.REGISTRY.register(metrics.Histogram(
+    'http_request_db_duration_seconds', 'Database time per request by view',
+    labelnames=('view',)
+))
+SERIALIZER_DURATION = metrics.REGISTRY.register(metrics.Histogram(
+    'http_request_serializer_duration_seconds', 'Serializer time per request by view',
+    labelnames=('view',)
+))
+RESPONSE_BYTES = metrics.REGISTRY.register(metrics.Histogram(
+    'http_response_bytes', 'Response body bytes by view',
+    labelnames=('view',), buckets=metrics.SIZE_BUCKETS
+))
+
+
+def view_name(view_func, method):
+    """``ViewSet.action`` for DRF viewsets, ``module.function`` otherwise"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is not None:
+        actions = getattr(view_func, 'actions', None) or {}
+        action = actions.get(method.lower(), method.lower())
+        return f'{cls.__name__}.{action}'
+    return f'{view_func.__module__}.{view_func.__name__}'
+
+
+class QueryTimer:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+_queries = contextvars.ContextVar('request_queries', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    """execute_wrapper adding each query to the current request's QueryTimer"""
+    queries = _queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries.duration += time.perf_counter() - started
+        queries.count += 1
+
+
+def install_query_timer(connection, **kwargs):
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+connection_created.connect(install_query_timer)
+
+
+def count_bytes(content, view):
+    sent = 0
+    try:
+        for chunk in content:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        RESPONSE_BYTES.observe(sent, view=view)
+
+
+async def acount_bytes(content, view):
+    sent = 0
+    try:
+        async for chunk in content:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        RESPONSE_BYTES.observe(sent, view=view)
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened later get the wrapper from connection_created
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if request.path == settings.METRICS_PATH:
+            return self.get_response(request)
+
+        started, timings, tokens = self.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            queries = self.end_request(tokens)
+        return self.record(request, response, started, timings, queries)
+
+    async def __acall__(self, request):
+        if request.path == settings.METRICS_PATH:
+            return await self.get_response(request)
+
+        started, timings, tokens = self.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            queries = self.end_request(tokens)
+        return self.record(request, response, started, timings, queries)
+
+    def start_request(self):
+        timings, timings_token = metrics.start_request()
+        queries_token = _queries.set(QueryTimer())
+        return time.perf_counter(), timings, (timings_token, queries_token)
+
+    def end_request(self, tokens):
+        timings_token, queries_token = tokens
+        queries = _queries.get()
+        _queries.reset(queries_token)
+        metrics.end_request(timings_token)
+        return queries
+
+    def record(self, request, response, started, timings, queries):
+        duration = time.perf_counter() - started
+        view = getattr(request, '_metrics_view', 'unmatched')
+        serializer = timings.durations.get('serializer', 0)
+        REQUEST_DURATION.observe(
+            duration, view=view, method=request.method, status=response.status_code
+        )
+        DB_QUERIES.observe(queries.count, view=view)
+        DB_DURATION.observe(queries.duration, view=view)
+        SERIALIZER_DURATION.observe(serializer, view=view)
+        self.record_bytes(response, view)
+
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'app;dur={duration * 1000:.1f}, '
+                f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} queries", '
+                f'serializer;dur={serializer * 1000:.1f}'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view = view_name(view_func, request.method)
+
+    def record_bytes(self, response, view):
+        length = response.get('Content-Length')
+        if not response.streaming:
+            RESPONSE_BYTES.observe(len(response.content), view=view)
+        elif length is not None:
+            RESPONSE_BYTES.observe(int(length), view=view)
+        elif response.is_async:
+            response.streaming_content = acount_bytes(response.streaming_content, view)
+        else:
+            response.streaming_content = count_bytes(response.streaming_content, view)
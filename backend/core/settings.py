@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -140,7 +141,7 @@ AUTH_USER_MODEL = 'authentication.User'
 # Add REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -172,6 +173,18 @@ SIMPLE_JWT = {
     'JTI_CLAIM': 'jti',
 }
 
+# In-process cache of the users behind access tokens, saving a User query per
+# authenticated request (see CachedJWTAuthentication)
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_TTL = 60  # seconds
+
+# Refresh-token revocation: a per-process Bloom filter of revoked token ids in
+# front of the RevokedToken table, synced and rebuilt on these intervals
+AUTH_REVOCATION_FILTER_CAPACITY = 100000
+AUTH_REVOCATION_FILTER_ERROR_RATE = 0.001
+AUTH_REVOCATION_SYNC_INTERVAL = 30  # seconds
+AUTH_REVOCATION_REBUILD_INTERVAL = 3600  # seconds
+
 # Add CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
@@ -208,3 +221,121 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'assets')
 # File upload settings
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_MIME_TYPES = ['application/octet-stream', 'text/plain']
+
+# Chunked (resumable) upload settings
+MAX_CHUNKED_UPLOAD_SIZE = 10 * 1024 * 1024 * 1024  # 10GB
+UPLOAD_PART_MAX_SIZE = 64 * 1024 * 1024  # 64MB
+UPLOAD_MAX_PARTS = 10000
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+
+# File delivery settings
+# StreamingDelivery serves bytes from Django and is meant for development.
+# In production use XAccelRedirectDelivery (nginx) or XSendfileDelivery so the
+# front proxy performs the transfer after Django has checked permissions.
+FILE_DELIVERY_BACKEND = 'apps.files.delivery.StreamingDelivery'
+FILE_DELIVERY_INTERNAL_URL = '/protected/'
+
+# Content-addressed storage: store identical ciphertext once and share it
+# between File rows through reference-counted blobs
+FILE_STORAGE_DEDUP = False
+
+# File list pagination (opt-in with ?page_size= or ?cursor=)
+FILE_LIST_PAGE_SIZE = 100
+FILE_LIST_MAX_PAGE_SIZE = 1000
+
+# Cache alias for "can user U access file F" decisions, or None to check the
+# database on every request. It must be shared by all workers (e.g. Redis):
+# a revoked share is only invalidated in the cache of the worker revoking it
+FILE_ACCESS_CACHE = os.getenv('FILE_ACCESS_CACHE') or None
+FILE_ACCESS_CACHE_TTL = 60  # seconds
+
+# Expired shares stop granting access immediately; prune_expired_shares
+# hard-deletes them once they have been expired for this long
+FILE_SHARE_EXPIRED_RETENTION = timedelta(days=7)
+FILE_BULK_SHARE_MAX_ITEMS = 1000  # files x recipients per bulk share request
+FILE_BULK_MAX_FILES = 1000  # files per bulk delete or bulk download request
+FILE_BULK_DELETE_BATCH_SIZE = 200
+
+# Default per-user storage quota in bytes (None for unlimited); override per
+# user with StorageUsage.quota
+FILE_STORAGE_QUOTA = 5 * 1024 * 1024 * 1024  # 5GB
+
+# Server-side envelope encryption at rest. Each file gets its own data key,
+# wrapped by a master key from FILE_KEYSTORE_BACKEND. Encrypted files cannot
+# be deduplicated or handed to the proxy, so they are always streamed by Django.
+FILE_ENCRYPTION_AT_REST = False
+FILE_KEYSTORE_BACKEND = 'apps.files.keystore.LocalKeyStore'
+FILE_ENCRYPTION_MASTER_KEYS = (
+    {'default': os.getenv('FILE_ENCRYPTION_MASTER_KEY')}
+    if os.getenv('FILE_ENCRYPTION_MASTER_KEY') else {}
+)
+FILE_ENCRYPTION_ACTIVE_KEY = 'default'
+FILE_DATA_KEY_CACHE_SIZE = 1024
+FILE_DATA_KEY_CACHE_TTL = 300  # seconds
+
+# Maintenance sweeps (expired links, orphaned blobs) work in batches and stop
+# after a time budget; the next run resumes where the last one stopped
+MAINTENANCE_BATCH_SIZE = 1000
+MAINTENANCE_TIME_BUDGET = 30  # seconds
+ORPHAN_GC_GRACE_PERIOD = timedelta(hours=1)
+
+# Built-in maintenance scheduler (manage.py run_scheduler). Each job runs every
+# interval plus up to MAINTENANCE_JITTER of it, on whichever node holds its lease
+MAINTENANCE_SCHEDULE = {
+    'cleanup_expired_links': timedelta(hours=1),
+    'collect_orphaned_blobs': timedelta(hours=6),
+    'prune_expired_shares': timedelta(hours=1),
+    'cleanup_expired_uploads': timedelta(hours=1),
+    'prune_revoked_tokens': timedelta(hours=6),
+}
+MAINTENANCE_JITTER = 0.1
+MAINTENANCE_LEASE_TIMEOUT = timedelta(minutes=10)
+
+# Google OAuth2 endpoints (overridable, e.g. to point tests at a local stub),
+# HTTP (connect, read) timeouts in seconds and retries for failed connections
+GOOGLE_OAUTH2_TOKEN_URL = os.getenv('GOOGLE_OAUTH2_TOKEN_URL', 'https://oauth2.googleapis.com/token')
+GOOGLE_OAUTH2_CERTS_URL = os.getenv(
+    'GOOGLE_OAUTH2_CERTS_URL', 'https://www.googleapis.com/oauth2/v1/certs'
+)
+GOOGLE_OAUTH2_TIMEOUT = (3.05, 10)
+GOOGLE_OAUTH2_RETRIES = 2
+
+# Structured request logging (utils.log). Events below WARNING are sampled per
+# endpoint; records are written to stderr from a background thread
+LOG_SAMPLE_RATE_DEFAULT = 1.0
+LOG_SAMPLE_RATES = {
+    'files.share': 0.01,
+    'auth.google_callback': 0.1,
+    'auth.google_token': 0.1,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {
+            '()': 'utils.log.StructuredFormatter',
+        },
+    },
+    'handlers': {
+        'queue': {
+            'class': 'utils.log.QueueStreamHandler',
+            'formatter': 'structured',
+        },
+    },
+    'loggers': {
+        'apps': {
+            'handlers': ['queue'],
+            'level': os.getenv('APP_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Per-view request metrics (core.middleware.MetricsMiddleware), served in the
+# Prometheus format at METRICS_PATH. Scrapes must send "Authorization: Bearer
+# <METRICS_AUTH_TOKEN>"; without a token the endpoint only answers when DEBUG
+# is on. core.urls routes METRICS_PATH to the endpoint.
+METRICS_PATH = '/metrics'
+METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN')
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', str(DEBUG)).lower() == 'true'
@@ -14,6 +14,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
@@ -21,6 +22,8 @@ from . import views
 
 urlpatterns = [
     path('', views.index),
+    # MetricsMiddleware leaves requests to METRICS_PATH unmeasured
+    path(settings.METRICS_PATH.lstrip('/'), views.metrics),
     path('admin/', admin.site.urls),
     path('api/auth/', include('apps.authentication.urls')),
     path('api/', include('apps.files.urls')),
@@ -1,6 +1,22 @@
+from django.conf import settings
 from django.http import HttpResponse
 from django.shortcuts import render 
+from django.utils.crypto import constant_time_compare
+
+from utils.metrics import REGISTRY
 
 def index(request):
     return HttpResponse("Hello, World!")
 
+def metrics(request):
+    """Request metrics of this process in the Prometheus text format"""
+    token = settings.METRICS_AUTH_TOKEN
+    if not token and not settings.DEBUG:
+        # Metrics name every endpoint and its traffic; only development
+        # serves them without a token
+        return HttpResponse(status=403)
+    if token and not constant_time_compare(
+        request.headers.get('Authorization', ''), f'Bearer {token}'
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
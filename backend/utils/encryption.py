@@ -1,7 +1,10 @@
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from django.conf import settings
 import base64
 import os
+import struct
 
 def generate_key():
     return Fernet.generate_key()
@@ -15,3 +18,146 @@ def encrypt_file(file_data):
 def decrypt_file(encrypted_data, key):
     f = Fernet(key)
     return f.decrypt(encrypted_data)
+
+# Streaming encryption
+#
+# encrypt_file/decrypt_file above need the whole plaintext in memory. The
+# stream format below encrypts fixed-size segments independently with
+# AES-256-GCM, so files of any size are processed in constant memory:
+#
+#   header  = MAGIC (4) | segment size (4, big-endian) | nonce prefix (7)
+#   segment = AES-GCM(key, nonce, plaintext segment, aad=header) + 16-byte tag
+#   nonce   = nonce prefix (7) | segment counter (4, big-endian) | last flag (1)
+#
+# The counter stops segments from being reordered and the last flag stops
+# the stream from being truncated at a segment boundary.
+
+STREAM_MAGIC = b'FSE1'
+STREAM_HEADER_SIZE = 15
+STREAM_SEGMENT_SIZE = 64 * 1024
+STREAM_TAG_SIZE = 16
+STREAM_NONCE_PREFIX_SIZE = 7
+
+
+class StreamDecryptionError(ValueError):
+    pass
+
+
+def generate_stream_key():
+    return AESGCM.generate_key(bit_length=256)
+
+
+def _segment_nonce(prefix, counter, last):
+    return prefix + struct.pack('>IB', counter, 1 if last else 0)
+
+
+def _read_exactly(src, size):
+    """Read up to size bytes, looping over short reads from sockets/pipes"""
+    chunks = []
+    while size > 0:
+        chunk = src.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def encrypted_size(plaintext_size, segment_size=STREAM_SEGMENT_SIZE):
+    """Size of the encrypted stream for a plaintext of the given size"""
+    segments = max(1, -(-plaintext_size // segment_size))
+    return STREAM_HEADER_SIZE + plaintext_size + segments * STREAM_TAG_SIZE
+
+
+def encrypt_stream(src, key, segment_size=STREAM_SEGMENT_SIZE):
+    """
+    Encrypt the binary file object ``src``, yielding the encrypted stream
+    piece by piece. Only one segment is held in memory at a time.
+    """
+    aead = AESGCM(key)
+    prefix = os.urandom(STREAM_NONCE_PREFIX_SIZE)
+    header = STREAM_MAGIC + struct.pack('>I', segment_size) + prefix
+    yield header
+
+    counter = 0
+    segment = _read_exactly(src, segment_size)
+    while True:
+        following = _read_exactly(src, segment_size)
+        last = not following
+        yield aead.encrypt(_segment_nonce(prefix, counter, last), segment, header)
+        if last:
+            return
+        segment = following
+        counter += 1
+
+
+def decrypt_stream(src, key):
+    """
+    Decrypt a stream produced by encrypt_stream, yielding plaintext
+    segments. Raises StreamDecryptionError on tampering or truncation.
+    """
+    header, segment_size, prefix = read_stream_header(src)
+    aead = AESGCM(key)
+
+    counter = 0
+    segment = _read_exactly(src, segment_size + STREAM_TAG_SIZE)
+    while True:
+        following = _read_exactly(src, segment_size + STREAM_TAG_SIZE)
+        last = not following
+        try:
+            yield aead.decrypt(_segment_nonce(prefix, counter, last), segment, header)
+        except InvalidTag:
+            raise StreamDecryptionError('Encrypted stream is corrupt or truncated')
+        if last:
+            return
+        segment = following
+        counter += 1
+
+
+def encrypt_fileobj(src, dst, key, segment_size=STREAM_SEGMENT_SIZE):
+    for chunk in encrypt_stream(src, key, segment_size):
+        dst.write(chunk)
+
+
+def decrypt_fileobj(src, dst, key):
+    for chunk in decrypt_stream(src, key):
+        dst.write(chunk)
+
+
+def read_stream_header(src):
+    """Return (header, segment_size, nonce_prefix) from the start of a stream"""
+    header = _read_exactly(src, STREAM_HEADER_SIZE)
+    if len(header) != STREAM_HEADER_SIZE or header[:4] != STREAM_MAGIC:
+        raise StreamDecryptionError('Not an encrypted stream')
+    return header, struct.unpack('>I', header[4:8])[0], header[8:]
+
+
+def decrypted_size(ciphertext_size, segment_size):
+    """Plaintext size of an encrypted stream of the given total size"""
+    body = ciphertext_size - STREAM_HEADER_SIZE
+    segments = max(1, -(-body // (segment_size + STREAM_TAG_SIZE)))
+    return body - segments * STREAM_TAG_SIZE
+
+
+def decrypt_range(src, key, start, end, ciphertext_size):
+    """
+    Yield plaintext bytes start..end (inclusive) of a seekable encrypted
+    stream, decrypting only the segments that overlap the range.
+    """
+    src.seek(0)
+    header, segment_size, prefix = read_stream_header(src)
+    stride = segment_size + STREAM_TAG_SIZE
+    last_segment = max(1, -(-(ciphertext_size - STREAM_HEADER_SIZE) // stride)) - 1
+    aead = AESGCM(key)
+
+    first = start // segment_size
+    src.seek(STREAM_HEADER_SIZE + first * stride)
+    for counter in range(first, end // segment_size + 1):
+        segment = _read_exactly(src, stride)
+        try:
+            plaintext = aead.decrypt(
+                _segment_nonce(prefix, counter, counter == last_segment), segment, header)
+        except InvalidTag:
+            raise StreamDecryptionError('Encrypted stream is corrupt or truncated')
+        offset = counter * segment_size
+        yield plaintext[max(start - offset, 0):end - offset + 1]
@@ -0,0 +1,56 @@
+import io
+import os
+
+from django.test import SimpleTestCase
+
+from utils.encryption import (
+    STREAM_HEADER_SIZE, STREAM_TAG_SIZE, StreamDecryptionError, decrypt_stream,
+    encrypt_stream, encrypted_size, generate_stream_key
+)
+
+SEGMENT_SIZE = 16
+
+
+def encrypt(data, key, segment_size=SEGMENT_SIZE):
+    return b''.join(encrypt_stream(io.BytesIO(data), key, segment_size))
+
+
+def decrypt(ciphertext, key):
+    return b''.join(decrypt_stream(io.BytesIO(ciphertext), key))
+
+
+class StreamEncryptionTests(SimpleTestCase):
+    def setUp(self):
+        self.key = generate_stream_key()
+
+    def test_round_trip(self):
+        # Empty, shorter than a segment, exact multiples and a partial last segment
+        for size in (0, 1, SEGMENT_SIZE, 3 * SEGMENT_SIZE, 3 * SEGMENT_SIZE + 5):
+            with self.subTest(size=size):
+                data = os.urandom(size)
+                ciphertext = encrypt(data, self.key)
+                self.assertEqual(len(ciphertext), encrypted_size(size, SEGMENT_SIZE))
+                self.assertEqual(decrypt(ciphertext, self.key), data)
+
+    def test_truncation_at_a_segment_boundary_fails(self):
+        ciphertext = encrypt(os.urandom(3 * SEGMENT_SIZE), self.key)
+        truncated = ciphertext[:-(SEGMENT_SIZE + STREAM_TAG_SIZE)]
+        with self.assertRaises(StreamDecryptionError):
+            decrypt(truncated, self.key)
+
+    def test_reordered_segments_fail(self):
+        ciphertext = encrypt(os.urandom(3 * SEGMENT_SIZE), self.key)
+        stride = SEGMENT_SIZE + STREAM_TAG_SIZE
+        header = ciphertext[:STREAM_HEADER_SIZE]
+        segments = [
+            ciphertext[offset:offset + stride]
+            for offset in range(STREAM_HEADER_SIZE, len(ciphertext), stride)
+        ]
+        swapped = header + segments[1] + segments[0] + segments[2]
+        with self.assertRaises(StreamDecryptionError):
+            decrypt(swapped, self.key)
+
+    def test_wrong_key_fails(self):
+        ciphertext = encrypt(b'secret data', self.key)
+        with self.assertRaises(StreamDecryptionError):
+            decrypt(ciphertext, generate_stream_key())
@@ -0,0 +1,77 @@
+import atexit
+import io
+import json
+import logging
+
+from django.test import SimpleTestCase, override_settings
+
+from utils.log import REDACTED, QueueStreamHandler, StructuredFormatter, log_event, redact
+
+logger = logging.getLogger('apps.tests.log')
+
+
+class RedactTests(SimpleTestCase):
+    def test_nested_credentials_are_masked(self):
+        data = {
+            'file': 'abc',
+            'user': {'email': 'a@example.com', 'password': 'hunter2'},
+            'grants': [{'access_token': 'x', 'scope': 'read'}],
+            'headers': {'Authorization': 'Bearer y'},
+            'refresh': 'z',
+        }
+        self.assertEqual(redact(data), {
+            'file': 'abc',
+            'user': {'email': 'a@example.com', 'password': REDACTED},
+            'grants': [{'access_token': REDACTED, 'scope': 'read'}],
+            'headers': {'Authorization': REDACTED},
+            'refresh': REDACTED,
+        })
+
+
+@override_settings(LOG_SAMPLE_RATE_DEFAULT=1.0, LOG_SAMPLE_RATES={'quiet': 0})
+class SamplingTests(SimpleTestCase):
+    def test_info_is_sampled(self):
+        with self.assertNoLogs(logger, logging.INFO):
+            log_event(logger, 'quiet', 'skipped')
+        with self.assertLogs(logger, logging.INFO):
+            log_event(logger, 'other', 'kept')
+
+    def test_warnings_and_errors_are_never_sampled(self):
+        with self.assertLogs(logger, logging.WARNING) as logs:
+            log_event(logger, 'quiet', 'warning', level=logging.WARNING)
+            log_event(logger, 'quiet', 'error', level=logging.ERROR)
+        self.assertEqual([record.getMessage() for record in logs.records], ['warning', 'error'])
+
+
+class QueueStreamHandlerTests(SimpleTestCase):
+    def make_handler(self, stream, maxsize):
+        handler = QueueStreamHandler(stream=stream, maxsize=maxsize)
+        handler.setFormatter(StructuredFormatter())
+        atexit.unregister(handler.listener.stop)
+        return handler
+
+    def record(self, message):
+        return logger.makeRecord(
+            logger.name, logging.INFO, __file__, 0, message, None, None,
+            extra={'endpoint': 'files.share', 'fields': {'file': 'abc'}}
+        )
+
+    def test_records_are_written_as_json(self):
+        stream = io.StringIO()
+        handler = self.make_handler(stream, maxsize=10)
+        handler.handle(self.record('shared'))
+        handler.listener.stop()
+
+        line = json.loads(stream.getvalue())
+        self.assertEqual(
+            (line['event'], line['endpoint'], line['file']), ('shared', 'files.share', 'abc')
+        )
+
+    def test_full_queue_drops_records(self):
+        stream = io.StringIO()
+        handler = self.make_handler(stream, maxsize=2)
+        handler.listener.stop()  # nothing drains the queue from here on
+
+        for i in range(5):
+            handler.handle(self.record(f'event {i}'))
+        self.assertEqual(handler.queue.qsize(), 2)